@@ -1,31 +1,128 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+import hmac
+import os
+
+import io
+
+from flask import Blueprint, Flask, render_template, request, redirect, url_for, session, flash, jsonify, \
+    current_app, Response, stream_with_context
 
 from datetime import timedelta, datetime, date  # Import date explicitly
 
 from classes.user import User, db
 from classes.schedule import Schedule
-from core.decorators import login_required, admin_required
-from core.utils import generate_shifts, get_week_dates, datetimeformat  # Import generate_shifts function
-app = Flask(__name__)
-app.secret_key = 'your_secure_random_secret_key'  # Replace with a secure, randomly generated secret key
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///scheduler.db'  # SQLite database file
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize the database
-db.init_app(app)
-
+from classes.availability import Availability, TimeOff
+from classes.shift_template import ShiftDemand, ShiftTemplate
+from classes.solution_cache import SolutionCache
+from core.decorators import login_required, admin_required, get_current_user, invalidate_user
+from core.utils import DAYS, get_week_dates, datetimeformat, parse_time
+from core.api import api
+from core.changes import schedules_changed, employees_changed, time_off_changed
+from core.database import database_config, init_database
+from core.events import event_bus, iter_event_stream
+from core.exports import iter_schedule_ics, iter_schedules_csv
+from core.jobs import schedule_jobs
+from core.metrics import init_metrics, metrics, span
+from core.schedule_edits import InvalidScheduleEdit, ScheduleEditError, apply_schedule_edits
+from core.queries import get_week_grid, get_user_week, get_inactive_employees
+from core.reports import payroll_report, weekly_labor_report
+from core.roster_import import RosterImportError, import_employees
+from core.solver import get_solver_settings, read_solver_overrides, get_objective_weights, read_objective_weights
+
+# Every page and form route; create_app registers it next to the JSON API
+main = Blueprint('main', __name__)
+
+
+# Application factory, used by python app.py, wsgi.py and the scripts that need the full app
+def create_app(config=None):
+    """
+    Create and configure the web application
+
+    Startup only loads Flask and SQLAlchemy. The OR-Tools solver stack is imported
+    by the first schedule generation, which keeps the boot time of each web worker low.
+
+    Args:
+        config (dict, optional): Settings applied over the defaults and environment
+            variables below, e.g. {'SQLALCHEMY_DATABASE_URI': ...} for a scratch database
+
+    Returns:
+        Flask: The configured app
+    """
+    app = Flask(__name__)
+    # Every worker must sign sessions with the same key, set SECRET_KEY in production
+    app.secret_key = os.environ.get('SECRET_KEY', 'your_secure_random_secret_key')
+
+    # Database configuration: DATABASE_URL, DB_POOL_* and SQLITE_BUSY_TIMEOUT_MS (see core/database.py)
+    app.config.update(database_config())
+
+    # Solver defaults for this deployment, the admin form can override them per request
+    app.config['SOLVER_NUM_WORKERS'] = 0  # 0 = use all cores
+    app.config['SOLVER_MAX_TIME_SECONDS'] = 30.0
+    app.config['SOLVER_RELATIVE_GAP'] = 0.0
+    app.config['SOLVER_DETERMINISTIC'] = False
+    app.config['SOLVER_RANDOM_SEED'] = 0
+
+    # Objective weights in cents (see core/solver.py), all zero accepts the first feasible schedule
+    app.config['OBJECTIVE_COST_WEIGHT'] = 0
+    app.config['OBJECTIVE_FAIRNESS_WEIGHT'] = 0
+    app.config['OBJECTIVE_WEEKEND_WEIGHT'] = 0
+
+    # Generation limits
+    app.config['SCHEDULE_MAX_WEEKS'] = 12  # Longest range generated in one solve
+    app.config['SCHEDULE_MIN_REST_HOURS'] = 11  # Rest between the end of one shift and the start of the next
+    app.config['SCHEDULE_MAX_SHIFTS_PER_DAY'] = 1  # Non-overlapping shifts one employee may work on a day
+    app.config['SCHEDULE_DIAGNOSE_INFEASIBLE'] = True  # Explain which requirements conflict when no schedule exists
+    app.config['SOLUTION_CACHE_SIZE'] = 50  # Solved schedules kept for identical regenerations (0 disables the cache)
+    # Worker processes shared by all generations to solve independent partitions (job assignments /
+    # locations that share no shift) at once; 1 solves them one after another in the job thread.
+    # The pool is sized once per web process.
+    app.config['SCHEDULE_PARTITION_PROCESSES'] = int(os.environ.get('SCHEDULE_PARTITION_PROCESSES', 1))
+
+    # Instrumentation
+    app.config['SLOW_REQUEST_SECONDS'] = float(os.environ.get('SLOW_REQUEST_SECONDS', 1.0))  # Log requests slower than this
+    # /metrics is served to an admin session or to "Authorization: Bearer <METRICS_TOKEN>";
+    # METRICS_PUBLIC=1 opens it to anyone, e.g. behind a private scrape network
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['METRICS_PUBLIC'] = os.environ.get('METRICS_PUBLIC', '').lower() in ('1', 'true', 'yes')
+
+    # Roster CSV import
+    app.config['ROSTER_IMPORT_MAX_ROWS'] = 10000
+    app.config['ROSTER_IMPORT_HASH_WORKERS'] = None  # Threads hashing passwords, None = executor default
+
+    # Days before and after today covered by an .ics feed when no range is given
+    app.config['ICS_EXPORT_PAST_DAYS'] = 31
+    app.config['ICS_EXPORT_FUTURE_DAYS'] = 366
+
+    # How long a user's role is trusted without re-reading the users table (0 disables the cache)
+    app.config['USER_CACHE_TTL_SECONDS'] = 30
+
+    # Live schedule updates (server-sent events); every open stream holds a server thread, so keep the
+    # cap well below the server's threads per process (4 of gunicorn's --threads 8 in wsgi.py).
+    # Further pages fall back to manual reloads.
+    app.config['LIVE_UPDATES_MAX_STREAMS'] = int(os.environ.get('LIVE_UPDATES_MAX_STREAMS', 4))
+    app.config['LIVE_UPDATES_STREAM_SECONDS'] = 300  # Browsers reconnect after a stream ends
+    app.config['LIVE_UPDATES_KEEPALIVE_SECONDS'] = 15
+
+    if config:
+        app.config.from_mapping(config)
+
+    # Initialize the database
+    init_database(app)
+    with app.app_context():
+        init_metrics(app, db.engine)
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+
+    app.jinja_env.filters['datetimeformat'] = datetimeformat
+    return app
 
-app.jinja_env.filters['datetimeformat'] = datetimeformat
 
 # Route to redirect root URL to login
-@app.route('/')
+@main.route('/')
 def index():
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # Route to handle login (both GET and POST methods)
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -35,9 +132,11 @@ def login():
         user = User.query.filter_by(username=username).first()
 
         # Check if user exists and password is correct
-        if user and user.check_password(password):
+        with span('password_check'):
+            valid = user is not None and user.check_password(password)
+        if valid:
             session['username'] = username  # Store username in session
-            return redirect(url_for('home'))
+            return redirect(url_for('main.home'))
         else:
             # If credentials are incorrect, return an error
             error = "Invalid username or password"
@@ -46,29 +145,29 @@ def login():
         return render_template('login.html', error=None)
 
 # Route for the home page
-@app.route('/home')
+@main.route('/home')
 @login_required
 def home():
     username = session['username']
-    user = User.query.filter_by(username=username).first()
+    user = get_current_user()
     role = user.role
     return render_template('home.html', username=username, role=role)
 
 # Route for the profile page
-@app.route('/profile')
+@main.route('/profile')
 @login_required
 def profile():
     username = session['username']
-    user = User.query.filter_by(username=username).first()
+    user = get_current_user()
     role = user.role
     return render_template('profile.html', user=user, role=role)
 
 # Route for editing profile
-@app.route('/edit_profile', methods=['GET', 'POST'])
+@main.route('/edit_profile', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
     username = session['username']
-    user = User.query.filter_by(username=username).first()
+    user = get_current_user()
 
     if request.method == 'POST':
         # Update user data with form data
@@ -77,16 +176,18 @@ def edit_profile():
         user.email = request.form['email']
         user.phone = request.form['phone']
         user.address = request.form['address']
+        employees_changed()
         db.session.commit()
-        return redirect(url_for('profile'))
+        invalidate_user(username)
+        return redirect(url_for('main.profile'))
     return render_template('edit_profile.html', user=user, role=user.role)
 
 # Route for resetting password
-@app.route('/reset_password', methods=['GET', 'POST'])
+@main.route('/reset_password', methods=['GET', 'POST'])
 @login_required
 def reset_password():
     username = session['username']
-    user = User.query.filter_by(username=username).first()
+    user = get_current_user()
     if request.method == 'POST':
         current_password = request.form['current_password']
         new_password = request.form['new_password']
@@ -108,8 +209,96 @@ def reset_password():
         return render_template('reset_password.html', message=message)
     return render_template('reset_password.html')
 
+# Read the per-day shift requirements from a generation form or JSON body.
+# Demand fields are named demand_<template id>_<day>; missing ones use the stored demand.
+def read_generation_params(data):
+    templates = ShiftTemplate.ordered()
+    if not templates:
+        raise ValueError('Add at least one shift template first.')
+    day_requirements = ShiftDemand.requirements(templates, DAYS)
+    for day in DAYS:
+        for template in templates:
+            value = data.get(f'demand_{template.id}_{day}')
+            if value not in (None, ''):
+                day_requirements[day][template.id] = int(value)
+            if day_requirements[day][template.id] < 0:
+                raise ValueError('Shift demand cannot be negative.')
+    weeks = int(data.get('weeks', 1))
+    if not 1 <= weeks <= current_app.config['SCHEDULE_MAX_WEEKS']:
+        raise ValueError(f"Weeks must be between 1 and {current_app.config['SCHEDULE_MAX_WEEKS']}.")
+    min_rest_hours = data.get('min_rest_hours')
+    if min_rest_hours in (None, ''):
+        min_rest_hours = current_app.config['SCHEDULE_MIN_REST_HOURS']
+    return {
+        'day_requirements': day_requirements,
+        'max_shifts': int(data.get('max_shifts', 5)),
+        'weeks': weeks,
+        'min_rest_hours': float(min_rest_hours),
+        'max_shifts_per_day': int(data.get('max_shifts_per_day') or current_app.config['SCHEDULE_MAX_SHIFTS_PER_DAY']),
+        'repair': data.get('action') == 'repair' or data.get('repair') in (True, '1', 'true', 'on'),
+        'solver_settings': get_solver_settings(read_solver_overrides(data)),
+        'objective_weights': get_objective_weights(read_objective_weights(data)),
+    }
+
+# Queue a background solve starting at the week being viewed.
+# Returns (job, error message) - exactly one of them is None.
+def submit_generation_job(params):
+    employees = User.query.filter(User.role != 'admin')
+    if employees.first() is None:
+        return None, 'Cannot generate schedules because there are no employees.'
+    # generate_shifts only schedules active employees
+    if employees.filter(User.active.is_(True)).first() is None:
+        return None, 'Cannot generate schedules because all employees are disabled.'
+
+    if 'view_date' not in session:
+        session['view_date'] = date.today().strftime('%Y-%m-%d')
+    params = dict(params, start_date=session['view_date'])
+
+    def run(job):
+        # The solver stack is loaded by the first generation a worker runs, not when it boots
+        from core.generation import generate_shifts
+
+        stats = {}
+        success = generate_shifts(
+            day_requirements=params['day_requirements'],
+            max_shifts_per_employee=params['max_shifts'],
+            start_date=params['start_date'],
+            job=job,
+            solver_settings=params['solver_settings'],
+            num_weeks=params['weeks'],
+            min_rest_hours=params['min_rest_hours'],
+            repair=params['repair'],
+            max_shifts_per_day=params['max_shifts_per_day'],
+            objective_weights=params['objective_weights'],
+            diagnose=current_app.config['SCHEDULE_DIAGNOSE_INFEASIBLE'],
+            cache_size=current_app.config['SOLUTION_CACHE_SIZE'],
+            partition_processes=current_app.config['SCHEDULE_PARTITION_PROCESSES'],
+            stats=stats
+        )
+        if success and stats.get('cached'):
+            return True, 'Schedules generated from a saved solution for the same settings.'
+        if success and params['repair'] and job.objective is not None:
+            return True, f'Schedules updated with {int(job.objective)} shift change(s).'
+        if success and 'objective' in stats:
+            found = 'optimal' if job.solver_status == 'OPTIMAL' else 'best found within the time limit'
+            return True, (f"Schedules generated ({found}): labor cost ${stats['labor_cost']:,.2f}, "
+                          f"objective {stats['objective']:,.0f}, bound {stats['best_bound']:,.0f}, "
+                          f"gap {stats['gap']:.1%}.")
+        if success and job.solver_status == 'FEASIBLE':
+            return True, 'Schedules generated with the best schedule found within the time limit.'
+        if success:
+            return True, 'Schedules generated successfully.'
+        if stats.get('diagnosis'):
+            return False, 'No feasible schedule found. These requirements cannot all be met: ' + \
+                ' '.join(stats['diagnosis'])
+        return False, 'No feasible schedule found.'
+
+    job = schedule_jobs.submit(current_app._get_current_object(), run, params)
+    session['schedule_job_id'] = job.id
+    return job, None
+
 # Route to view and generate schedules
-@app.route('/view_schedules', methods=['GET', 'POST'])
+@main.route('/view_schedules', methods=['GET', 'POST'])
 @login_required
 def view_schedules():
     if 'view_date' not in session:
@@ -117,94 +306,120 @@ def view_schedules():
     
     week_dates = get_week_dates(session['view_date'])
     username = session['username']
-    user = User.query.filter_by(username=username).first()
+    user = get_current_user()
     role = user.role
     current_week = f"{week_dates[0].strftime('%B %d, %Y')} - {week_dates[-1].strftime('%B %d, %Y')}"
 
     if role == 'admin':
         if request.method == 'POST':
-            employees = User.query.filter(User.role != 'admin').all()
-            if not employees:
-                flash('Cannot generate schedules because there are no employees.', 'error')
-                return redirect(url_for('view_schedules'))
-            
-            if request.form['action'] == 'generate':
-                # Filter out disabled employees
-                disabled_employees = session.get('disabled_employees', [])
-                active_employees = [emp for emp in employees if emp.username not in disabled_employees]
-                
-                if not active_employees:
-                    flash('Cannot generate schedules because all employees are disabled.', 'error')
-                    return redirect(url_for('view_schedules'))
-                
-                # Create day requirements dictionary
-                days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-                day_requirements = {}
-                
-                for day in days:
-                    day_requirements[day] = {
-                        'opening': int(request.form.get(f'opening_shifts_{day}', 1)),
-                        'midday': int(request.form.get(f'midday_shifts_{day}', 1)),
-                        'closing': int(request.form.get(f'closing_shifts_{day}', 1))
-                    }
-                    # Store in session for form persistence
-                    session[f'opening_shifts_{day}'] = day_requirements[day]['opening']
-                    session[f'midday_shifts_{day}'] = day_requirements[day]['midday']
-                    session[f'closing_shifts_{day}'] = day_requirements[day]['closing']
-                
-                session['max_shifts'] = int(request.form.get('max_shifts', 5))
-                
-                success = generate_shifts(
-                    day_requirements=day_requirements,
-                    max_shifts_per_employee=session['max_shifts'],
-                    active_employees=[emp.username for emp in active_employees],  # Pass only active employees
-                    start_date=session['view_date']  # Add this line
-                )
-                
-                if success:
-                    flash('Schedules generated successfully.', 'success')
+            if request.form['action'] in ('generate', 'repair'):
+                try:
+                    params = read_generation_params(request.form)
+                except ValueError as exc:
+                    flash(f'Invalid generation settings: {exc}', 'error')
+                    return redirect(url_for('main.view_schedules'))
+                # Demand is kept with the shift templates, the other settings in the session
+                ShiftDemand.save_requirements(params['day_requirements'], DAYS)
+                session['max_shifts'] = params['max_shifts']
+                session['max_shifts_per_day'] = params['max_shifts_per_day']
+                session['weeks'] = params['weeks']
+                session['min_rest_hours'] = params['min_rest_hours']
+                session['solver_settings'] = params['solver_settings']
+                session['objective_weights'] = params['objective_weights']
+
+                job, error = submit_generation_job(params)
+                if error:
+                    flash(error, 'error')
                 else:
-                    flash('No feasible schedule found.', 'error')
-                return redirect(url_for('view_schedules'))
-        
+                    flash('Schedule generation started.', 'success')
+                return redirect(url_for('main.view_schedules'))
+
+        # Report on the last background generation, if there is one
+        schedule_job = None
+        if 'schedule_job_id' in session:
+            job = schedule_jobs.get(session['schedule_job_id'])
+            if job is None:
+                session.pop('schedule_job_id')
+            elif job.finished:
+                session.pop('schedule_job_id')
+                flash(job.message, 'success' if job.status == 'completed' else 'error')
+            else:
+                schedule_job = job.to_dict()
+
         # Display the current schedules
-        employees = User.query.filter(User.role != 'admin').all()
-        schedules = {}
-        for employee in employees:
-            employee_schedule = Schedule.query.filter_by(username=employee.username).filter(
-                Schedule.date.in_([d.strftime('%Y-%m-%d') for d in week_dates])).all()
-            date_to_shift = {s.date: s for s in employee_schedule}
-            schedules[employee.username] = date_to_shift
+        with span('week_grid_query'):
+            schedules = get_week_grid(week_dates)
+        shift_templates = ShiftTemplate.ordered()
         return render_template('admin_view_schedules.html', 
                               schedules=schedules, 
                               week_dates=week_dates,
                               current_week=current_week,
-                              disabled_employees=session.get('disabled_employees', []))
+                              schedule_job=schedule_job,
+                              disabled_employees=get_inactive_employees(),
+                              shift_templates=shift_templates,
+                              day_requirements=ShiftDemand.requirements(shift_templates, DAYS))
     else:
-        # For regular users, display their own schedules
-        user_schedule = Schedule.query.filter_by(username=username).filter(
-            Schedule.date.in_([d.strftime('%Y-%m-%d') for d in week_dates])).all()
-        # Build a date-to-shift mapping for the user
-        date_to_shift = {s.date: s for s in user_schedule}
+        # For regular users, display their own schedules as a date-to-shift mapping
+        date_to_shift = get_user_week(username, week_dates)
         return render_template('view_schedules.html', username=username, role=role, week_dates=week_dates,
                                user_schedule=date_to_shift, current_week=current_week)
 
+# Route to start a background schedule generation (Admin only)
+@main.route('/schedule_jobs', methods=['POST'])
+@admin_required
+def create_schedule_job():
+    data = request.get_json(silent=True) or request.form
+    try:
+        params = read_generation_params(data)
+    except (TypeError, ValueError) as exc:
+        return jsonify({'status': 'error', 'message': f'Invalid generation settings: {exc}'}), 400
+
+    job, error = submit_generation_job(params)
+    if error:
+        return jsonify({'status': 'error', 'message': error}), 400
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = url_for('main.schedule_job_status', job_id=job.id)
+    return response
+
+# Route to poll the status and progress of a generation job (Admin only)
+@main.route('/schedule_jobs/<job_id>')
+@admin_required
+def schedule_job_status(job_id):
+    job = schedule_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    # The page shows the result itself, so it is not flashed again on the next visit
+    if job.finished and session.get('schedule_job_id') == job_id:
+        session.pop('schedule_job_id')
+    return jsonify(job.to_dict())
+
+# Route to cancel a queued or running generation job (Admin only)
+@main.route('/schedule_jobs/<job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_schedule_job(job_id):
+    job = schedule_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
 # Route to handle logout
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
+    invalidate_user(session['username'])
     session.pop('username', None)
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # Route to manage employees (Admin only)
-@app.route('/manage_employees')
+@main.route('/manage_employees')
 @admin_required
 def manage_employees():
     employees = User.query.filter(User.role != 'admin').all()
     return render_template('manage_employees.html', employees=employees, role='admin')
 
 # Route to add a new employee (Admin only)
-@app.route('/add_employee', methods=['GET', 'POST'])
+@main.route('/add_employee', methods=['GET', 'POST'])
 @admin_required
 def add_employee():
     if request.method == 'POST':
@@ -218,6 +433,7 @@ def add_employee():
         address = request.form['address']
         hire_date = request.form['hire_date']
         job_assignment = request.form['job_assignment']
+        location = request.form.get('location', '').strip() or None
         hourly_rate = request.form['hourly_rate']
         sick_hours = request.form.get('sick_hours', 0)
         pto_hours = request.form.get('pto_hours', 0)
@@ -226,7 +442,7 @@ def add_employee():
         # Check if username already exists
         if User.query.filter_by(username=username).first():
             flash('Username already exists. Please choose a different username.', 'error')
-            return redirect(url_for('add_employee'))
+            return redirect(url_for('main.add_employee'))
 
         # Create new user
         new_user = User(
@@ -238,6 +454,7 @@ def add_employee():
             address=address,
             hire_date=hire_date,
             job_assignment=job_assignment,
+            location=location,
             hourly_rate=hourly_rate,
             sick_hours=sick_hours,
             pto_hours=pto_hours,
@@ -245,19 +462,44 @@ def add_employee():
         )
         new_user.set_password(password)
         db.session.add(new_user)
+        employees_changed()
         db.session.commit()
         flash('Employee added successfully.', 'success')
-        return redirect(url_for('manage_employees'))
+        return redirect(url_for('main.manage_employees'))
     return render_template('add_employee.html', role='admin')
 
+# Route to import employees from a CSV file (Admin only)
+@main.route('/import_employees', methods=['GET', 'POST'])
+@admin_required
+def import_employees_csv():
+    errors = []
+    if request.method == 'POST':
+        upload = request.files.get('roster')
+        if upload is None or not upload.filename:
+            flash('Choose a CSV file to import.', 'error')
+            return redirect(url_for('main.import_employees_csv'))
+        try:
+            count = import_employees(io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''),
+                                     max_rows=current_app.config['ROSTER_IMPORT_MAX_ROWS'],
+                                     hash_workers=current_app.config['ROSTER_IMPORT_HASH_WORKERS'])
+        except UnicodeDecodeError:
+            flash('The file is not UTF-8 encoded text.', 'error')
+        except RosterImportError as exc:
+            flash(str(exc), 'error')
+            errors = exc.errors
+        else:
+            flash(f'Imported {count} employee(s).', 'success')
+            return redirect(url_for('main.manage_employees'))
+    return render_template('import_employees.html', errors=errors, role='admin')
+
 # Route to edit an existing employee (Admin only)
-@app.route('/edit_employee/<username>', methods=['GET', 'POST'])
+@main.route('/edit_employee/<username>', methods=['GET', 'POST'])
 @admin_required
 def edit_employee(username):
     user = User.query.filter_by(username=username).first()
     if not user or user.role == 'admin':
         flash('Employee not found.', 'error')
-        return redirect(url_for('manage_employees'))
+        return redirect(url_for('main.manage_employees'))
 
     if request.method == 'POST':
         # Update user data
@@ -268,95 +510,422 @@ def edit_employee(username):
         user.address = request.form['address']
         user.hire_date = request.form['hire_date']
         user.job_assignment = request.form['job_assignment']
+        user.location = request.form.get('location', '').strip() or None
         user.hourly_rate = request.form['hourly_rate']
         user.sick_hours = request.form.get('sick_hours', 0)
         user.pto_hours = request.form.get('pto_hours', 0)
         password = request.form.get('password')
         if password:
             user.set_password(password)
+        employees_changed(repriced=[username])
         db.session.commit()
+        invalidate_user(username)
+        SolutionCache.clear()
         flash('Employee updated successfully.', 'success')
-        return redirect(url_for('manage_employees'))
+        return redirect(url_for('main.manage_employees'))
 
     return render_template('edit_employee.html', user=user, role='admin')
 
 # Route to delete an employee (Admin only)
-@app.route('/delete_employee/<username>', methods=['POST'])
+@main.route('/delete_employee/<username>', methods=['POST'])
 @admin_required
 def delete_employee(username):
     user = User.query.filter_by(username=username).first()
     if not user or user.role == 'admin':
         flash('Employee not found.', 'error')
-        return redirect(url_for('manage_employees'))
-
-    # Delete user's schedules
-    Schedule.query.filter_by(username=username).delete()
+        return redirect(url_for('main.manage_employees'))
+
+    # Delete user's schedules, availability and time off
+    user_schedules = Schedule.query.filter_by(username=username)
+    shifts = user_schedules.with_entities(Schedule.id, Schedule.date).all()
+    user_schedules.delete()
+    schedules_changed({day for _, day in shifts}, [username], deleted=[shift_id for shift_id, _ in shifts])
+    Availability.query.filter_by(username=username).delete()
+    TimeOff.query.filter_by(username=username).delete()
     db.session.delete(user)
+    employees_changed()
     db.session.commit()
+    invalidate_user(username)
+    SolutionCache.clear()
     flash('Employee deleted successfully.', 'success')
-    return redirect(url_for('manage_employees'))
-
-@app.route('/update_shift', methods=['POST'])
+    return redirect(url_for('main.manage_employees'))
+
+# Limits manual edits are checked against, the ones last used to generate schedules
+def schedule_edit_limits():
+    min_rest_hours = session.get('min_rest_hours')
+    if min_rest_hours in (None, ''):
+        min_rest_hours = current_app.config['SCHEDULE_MIN_REST_HOURS']
+    return {
+        'max_shifts_per_employee': session.get('max_shifts', 5),
+        'max_shifts_per_day': session.get('max_shifts_per_day', current_app.config['SCHEDULE_MAX_SHIFTS_PER_DAY']),
+        'min_rest_hours': float(min_rest_hours),
+    }
+
+# Route to apply a batch of shift edits atomically (Admin only)
+@main.route('/schedules/batch', methods=['POST'])
+@admin_required
+def batch_edit_schedules():
+    data = request.get_json(silent=True) or {}
+    try:
+        changed, deleted = apply_schedule_edits(data.get('operations'), **schedule_edit_limits())
+    except InvalidScheduleEdit as exc:
+        return jsonify({'status': 'error', 'message': str(exc), 'index': exc.index}), 400
+    except ScheduleEditError as exc:
+        # Well-formed edits that clash with the schedule or its limits
+        return jsonify({'status': 'error', 'message': str(exc), 'index': exc.index}), 409
+    return jsonify({'status': 'success', 'shifts': changed, 'deleted': deleted})
+
+# Route to change the times of one shift from the edit form (Admin only)
+@main.route('/update_shift', methods=['POST'])
 @admin_required
 def update_shift():
-    username = request.form.get('username')
-    date = request.form.get('date')
-    start_time = request.form.get('start_time')
-    end_time = request.form.get('end_time')
-
-    # Update the schedule
-    schedule = Schedule.query.filter_by(
-        username=username,
-        date=date
-    ).first()
-
-    if schedule:
-        schedule.start_time = start_time
-        schedule.end_time = end_time
-        db.session.commit()
-        flash('Shift updated successfully', 'success')
-    else:
+    # An employee can work several shifts a day, so the shift is picked by id rather than by date
+    try:
+        shift_id = int(request.form.get('shift_id', ''))
+    except ValueError:
         flash('Shift not found', 'error')
+        return redirect(url_for('main.view_schedules'))
 
-    return redirect(url_for('view_schedules'))
+    try:
+        apply_schedule_edits([{'op': 'update', 'shift_id': shift_id, 'start_time': request.form.get('start_time'),
+                               'end_time': request.form.get('end_time')}], **schedule_edit_limits())
+        flash('Shift updated successfully', 'success')
+    except ScheduleEditError as exc:
+        flash(str(exc), 'error')
+    return redirect(url_for('main.view_schedules'))
 
-@app.route('/reassign_shift', methods=['POST'])
+# Route to stream changes to one week's schedules as server-sent events.
+# Admins get the changed shifts, employees are only told to reload when their own shifts changed.
+@main.route('/schedules/stream')
+@login_required
+def schedule_stream():
+    user = get_current_user()
+    try:
+        week = get_week_dates(request.args.get('week') or session.get('view_date'))[0]
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Expected week as YYYY-MM-DD'}), 400
+    # Same shape as the events queued by core.changes.schedules_changed
+    subscription = event_bus.subscribe(f'week:{week.isoformat()}',
+                                       max_subscribers=current_app.config['LIVE_UPDATES_MAX_STREAMS'],
+                                       refresh_payload={'week': week.isoformat(), 'refresh': True, 'usernames': None})
+    if subscription is None:
+        return jsonify({'status': 'error', 'message': 'Too many live update streams'}), 503
+
+    select = None
+    if user.role != 'admin':
+        username = user.username
+
+        def select(change):
+            if change['usernames'] is not None and username not in change['usernames']:
+                return None
+            return {'week': change.get('week', week.isoformat()), 'refresh': True}
+
+    stream = iter_event_stream(subscription, keepalive_seconds=current_app.config['LIVE_UPDATES_KEEPALIVE_SECONDS'],
+                               max_seconds=current_app.config['LIVE_UPDATES_STREAM_SECONDS'], select=select)
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Route to move one shift to another employee (Admin only), kept for single edits
+@main.route('/reassign_shift', methods=['POST'])
 @admin_required
 def reassign_shift():
-    data = request.get_json()
-    shift_id = data.get('shift_id')
-    new_employee = data.get('new_employee')
-    
-    shift = Schedule.query.get(shift_id)
-    if shift:
-        shift.username = new_employee
-        db.session.commit()
-        return jsonify({'status': 'success'})
-    return jsonify({'status': 'error'}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        changed, _ = apply_schedule_edits([{'op': 'reassign', 'shift_id': data.get('shift_id'),
+                                            'username': data.get('new_employee'), 'date': data.get('date')}],
+                                          **schedule_edit_limits())
+    except InvalidScheduleEdit as exc:
+        return jsonify({'status': 'error', 'message': str(exc)}), 400
+    except ScheduleEditError as exc:
+        return jsonify({'status': 'error', 'message': str(exc)}), 409
+    return jsonify({'status': 'success', 'shifts': changed})
+
+# Set the scheduling flag for several employees with one UPDATE, returns the number changed
+def set_employees_active(usernames, active):
+    updated = User.query.filter(User.username.in_(usernames), User.role != 'admin').update(
+        {User.active: active}, synchronize_session=False)
+    if updated:
+        employees_changed()
+    db.session.commit()
+    return updated
 
-@app.route('/toggle_employee_status', methods=['POST'])
+# Enable or disable one employee for schedule generation (Admin only)
+@main.route('/toggle_employee_status', methods=['POST'])
 @admin_required
 def toggle_employee_status():
     data = request.get_json()
     username = data.get('username')
     disabled = data.get('disabled')
-    
-    if 'disabled_employees' not in session:
-        session['disabled_employees'] = []
-    
-    disabled_employees = session['disabled_employees']
-    
-    if disabled and username not in disabled_employees:
-        disabled_employees.append(username)
-    elif not disabled and username in disabled_employees:
-        disabled_employees.remove(username)
-    
-    session['disabled_employees'] = disabled_employees
-    
+
+    updated = set_employees_active([username], not disabled)
+    if not updated:
+        return jsonify({'status': 'error', 'message': 'Employee not found'}), 404
     return jsonify({'status': 'success'})
 
+# Enable or disable many employees in one statement (Admin only)
+@main.route('/employees/status', methods=['POST'])
+@admin_required
+def bulk_employee_status():
+    data = request.get_json(silent=True) or {}
+    usernames = data.get('usernames')
+    active = data.get('active')
+    if not isinstance(usernames, list) or not isinstance(active, bool):
+        return jsonify({'status': 'error',
+                        'message': 'Expected {"usernames": [...], "active": true|false}'}), 400
+
+    updated = set_employees_active(usernames, active)
+    return jsonify({'status': 'success', 'updated': updated})
+
+# Route to list and add shift templates (Admin only)
+@main.route('/shift_templates', methods=['GET', 'POST'])
+@admin_required
+def shift_templates():
+    if request.method == 'POST':
+        name = request.form.get('name', '').strip()
+        job_assignment = request.form.get('job_assignment', '').strip() or None
+        location = request.form.get('location', '').strip() or None
+        try:
+            start_time = parse_time(request.form.get('start_time', ''))
+            end_time = parse_time(request.form.get('end_time', ''))
+            required = int(request.form.get('required') or 0)
+        except ValueError:
+            flash('Invalid shift template.', 'error')
+            return redirect(url_for('main.shift_templates'))
+        if not name or start_time == end_time or required < 0:
+            flash('Invalid shift template.', 'error')
+            return redirect(url_for('main.shift_templates'))
+        if ShiftTemplate.query.filter_by(name=name).first():
+            flash('A shift template with that name already exists.', 'error')
+            return redirect(url_for('main.shift_templates'))
+
+        template = ShiftTemplate(name=name, start_time=start_time, end_time=end_time,
+                                 job_assignment=job_assignment, location=location)
+        template.demands = [ShiftDemand(weekday=weekday, required=required) for weekday in range(7)]
+        db.session.add(template)
+        db.session.commit()
+        flash('Shift template added.', 'success')
+        return redirect(url_for('main.shift_templates'))
+
+    # Suggestions for the job assignment and location fields
+    job_assignments = [value for value, in db.session.query(User.job_assignment).filter(
+        User.role != 'admin', User.job_assignment.isnot(None)).distinct().order_by(User.job_assignment)]
+    locations = [value for value, in db.session.query(User.location).filter(
+        User.role != 'admin', User.location.isnot(None)).distinct().order_by(User.location)]
+    return render_template('shift_templates.html', shift_templates=ShiftTemplate.ordered(), role='admin',
+                           job_assignments=job_assignments, locations=locations)
+
+# Route to delete a shift template and its demand (Admin only).
+# Schedules already generated from it are kept.
+@main.route('/shift_templates/<int:template_id>/delete', methods=['POST'])
+@admin_required
+def delete_shift_template(template_id):
+    template = db.session.get(ShiftTemplate, template_id)
+    if template is None:
+        flash('Shift template not found.', 'error')
+    else:
+        db.session.delete(template)
+        db.session.commit()
+        flash('Shift template deleted.', 'success')
+    return redirect(url_for('main.shift_templates'))
+
+# Look up whose availability a request is about: employees only ever see their own,
+# admins may pass ?username= to manage someone else's
+def availability_owner(current_user):
+    username = request.args.get('username')
+    if current_user.role != 'admin' or not username or username == current_user.username:
+        return current_user
+    return User.query.filter_by(username=username).first()
+
+# Route to view and edit availability windows and time off requests
+@main.route('/availability', methods=['GET', 'POST'])
+@login_required
+def availability():
+    current_user = get_current_user()
+    employee = availability_owner(current_user)
+    if employee is None:
+        flash('Employee not found.', 'error')
+        return redirect(url_for('main.manage_employees'))
+    back = url_for('main.availability', username=employee.username)
+
+    if request.method == 'POST':
+        action = request.form.get('action')
+        if action == 'add_window':
+            try:
+                weekday = int(request.form.get('weekday', ''))
+                start_time = parse_time(request.form.get('start_time', ''))
+                end_time = parse_time(request.form.get('end_time', ''))
+            except ValueError:
+                flash('Invalid availability window.', 'error')
+                return redirect(back)
+            if not 0 <= weekday <= 6 or start_time == end_time:
+                flash('Invalid availability window.', 'error')
+                return redirect(back)
+            db.session.add(Availability(username=employee.username, weekday=weekday,
+                                        start_time=start_time, end_time=end_time))
+            db.session.commit()
+            flash('Availability added.', 'success')
+        elif action == 'request_time_off':
+            try:
+                start_date = datetime.strptime(request.form.get('start_date', ''), '%Y-%m-%d').date()
+                end_date = datetime.strptime(request.form.get('end_date', ''), '%Y-%m-%d').date()
+                hours = float(request.form.get('hours') or 0)
+            except ValueError:
+                flash('Invalid time off request.', 'error')
+                return redirect(back)
+            kind = request.form.get('kind', 'pto')
+            if end_date < start_date or hours < 0 or kind not in TimeOff.KINDS:
+                flash('Invalid time off request.', 'error')
+                return redirect(back)
+            db.session.add(TimeOff(username=employee.username, start_date=start_date, end_date=end_date,
+                                   kind=kind, hours=hours, note=request.form.get('note') or None))
+            db.session.commit()
+            flash('Time off requested.', 'success')
+        return redirect(back)
+
+    windows = Availability.query.filter_by(username=employee.username) \
+        .order_by(Availability.weekday, Availability.start_time).all()
+    time_off_requests = TimeOff.query.filter_by(username=employee.username) \
+        .order_by(TimeOff.start_date.desc()).all()
+    return render_template('availability.html', employee=employee, windows=windows,
+                           time_off_requests=time_off_requests, weekdays=[day.capitalize() for day in DAYS],
+                           role=current_user.role)
+
+# Route to remove an availability window
+@main.route('/availability/<int:window_id>/delete', methods=['POST'])
+@login_required
+def delete_availability(window_id):
+    current_user = get_current_user()
+    window = db.session.get(Availability, window_id)
+    if window is None or (current_user.role != 'admin' and window.username != current_user.username):
+        flash('Availability window not found.', 'error')
+        return redirect(url_for('main.availability'))
+    username = window.username
+    db.session.delete(window)
+    db.session.commit()
+    flash('Availability removed.', 'success')
+    return redirect(url_for('main.availability', username=username))
+
+# Balance column charged for each kind of time off; unpaid leave has none
+TIME_OFF_BALANCES = {'pto': 'pto_hours', 'sick': 'sick_hours'}
+
+# Route to approve, deny or cancel a time off request.
+# Approving charges the employee's balance, cancelling an approved request refunds it.
+@main.route('/time_off/<int:time_off_id>/<action>', methods=['POST'])
+@login_required
+def update_time_off(time_off_id, action):
+    current_user = get_current_user()
+    is_admin = current_user.role == 'admin'
+    time_off = db.session.get(TimeOff, time_off_id)
+    if time_off is None or (not is_admin and time_off.username != current_user.username):
+        flash('Time off request not found.', 'error')
+        return redirect(url_for('main.availability'))
+    back = url_for('main.time_off_requests') if is_admin and action != 'cancel' \
+        else url_for('main.availability', username=time_off.username)
+
+    employee = User.query.filter_by(username=time_off.username).first()
+    balance = TIME_OFF_BALANCES.get(time_off.kind)
+    if action in ('approve', 'deny'):
+        if not is_admin:
+            flash('Access denied. Admins only.', 'error')
+            return redirect(back)
+        if time_off.status != 'pending':
+            flash('Only pending requests can be approved or denied.', 'error')
+            return redirect(back)
+        if action == 'approve' and balance:
+            available = float(getattr(employee, balance) or 0)
+            if available < time_off.hours:
+                flash(f'{employee.username} only has {available:g} {time_off.kind} hours left.', 'error')
+                return redirect(back)
+            setattr(employee, balance, available - time_off.hours)
+        time_off.status = 'approved' if action == 'approve' else 'denied'
+        time_off_changed()
+        db.session.commit()
+        invalidate_user(employee.username)
+        flash(f'Time off request {time_off.status}.', 'success')
+    elif action == 'cancel':
+        if time_off.status == 'approved' and balance:
+            setattr(employee, balance, float(getattr(employee, balance) or 0) + time_off.hours)
+        db.session.delete(time_off)
+        time_off_changed()
+        db.session.commit()
+        invalidate_user(employee.username)
+        flash('Time off request cancelled.', 'success')
+    else:
+        flash('Unknown action.', 'error')
+    return redirect(back)
+
+# Route to list pending time off requests (Admin only)
+@main.route('/time_off_requests')
+@admin_required
+def time_off_requests():
+    pending = TimeOff.query.filter_by(status='pending').order_by(TimeOff.start_date).all()
+    return render_template('time_off_requests.html', pending=pending, role='admin')
+
+# Route to report hours, labor cost and time off over a date range (Admin only), this month by default
+@main.route('/reports')
+@admin_required
+def reports():
+    today = date.today()
+    try:
+        start, end = export_range(today.replace(day=1), today)
+    except ValueError:
+        flash('Invalid report range, expected start and end as YYYY-MM-DD.', 'error')
+        start, end = today.replace(day=1), today
+    return render_template('reports.html', start=start, end=end, payroll=payroll_report(start, end),
+                           weekly=weekly_labor_report(start, end), role='admin')
+
+# Read an inclusive date range from the query string, ValueError if it is invalid
+def export_range(default_start, default_end):
+    start = date.fromisoformat(request.args.get('start') or default_start.isoformat())
+    end = date.fromisoformat(request.args.get('end') or default_end.isoformat())
+    if end < start:
+        raise ValueError('end is before start')
+    return start, end
+
+# Route to download schedules in a date range as CSV, employees get their own shifts
+@main.route('/export/schedules.csv')
+@login_required
+def export_schedules_csv():
+    user = get_current_user()
+    week_dates = get_week_dates(session.get('view_date', date.today().strftime('%Y-%m-%d')))
+    try:
+        start, end = export_range(week_dates[0], week_dates[-1])
+    except ValueError:
+        flash('Invalid export range, expected start and end as YYYY-MM-DD.', 'error')
+        return redirect(url_for('main.view_schedules'))
+    username = request.args.get('username') if user.role == 'admin' else user.username
+
+    # The generator runs after the view returns, stream_with_context keeps the session usable
+    response = Response(stream_with_context(iter_schedules_csv(start, end, username)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename=schedules_{start}_{end}.csv'
+    return response
+
+# Route to download one employee's shifts as an iCalendar file (the employee or an admin)
+@main.route('/export/<username>.ics')
+@login_required
+def export_schedule_ics(username):
+    user = get_current_user()
+    if user.role != 'admin' and user.username != username:
+        flash('Access denied', 'error')
+        return redirect(url_for('main.view_schedules'))
+    if User.query.filter_by(username=username).first() is None:
+        flash('Employee not found.', 'error')
+        return redirect(url_for('main.view_schedules'))
+    today = date.today()
+    try:
+        start, end = export_range(today - timedelta(days=current_app.config['ICS_EXPORT_PAST_DAYS']),
+                                  today + timedelta(days=current_app.config['ICS_EXPORT_FUTURE_DAYS']))
+    except ValueError:
+        flash('Invalid export range, expected start and end as YYYY-MM-DD.', 'error')
+        return redirect(url_for('main.view_schedules'))
+
+    response = Response(stream_with_context(iter_schedule_ics(username, start, end, host=request.host)),
+                        mimetype='text/calendar')
+    response.headers['Content-Disposition'] = f'attachment; filename={username}.ics'
+    return response
+
 # Add new route for week navigation
-@app.route('/change_week/<direction>')
+@main.route('/change_week/<direction>')
 @login_required
 def change_week(direction):
     current_date = datetime.strptime(session.get('view_date', date.today().strftime('%Y-%m-%d')), '%Y-%m-%d')
@@ -367,8 +936,19 @@ def change_week(direction):
         new_date = current_date - timedelta(weeks=1)
     
     session['view_date'] = new_date.strftime('%Y-%m-%d')
-    return redirect(url_for('view_schedules'))
+    return redirect(url_for('main.view_schedules'))
+
+# Prometheus scrape endpoint with request, SQL and solver phase metrics
+@main.route('/metrics')
+def metrics_endpoint():
+    if not current_app.config.get('METRICS_PUBLIC'):
+        token = current_app.config.get('METRICS_TOKEN')
+        has_token = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+        user = None if has_token else get_current_user()
+        if not has_token and (user is None or user.role != 'admin'):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
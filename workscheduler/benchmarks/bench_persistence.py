@@ -0,0 +1,85 @@
+"""
+Compare per-row ORM inserts with the bulk path used by generate_shifts.
+
+Run from the workscheduler folder:
+    python -m benchmarks.bench_persistence [employee counts...]
+
+Each employee gets five shifts, i.e. one generated week. Both strategies write
+to a fresh temporary SQLite database with the app's pragmas applied.
+"""
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask
+
+from classes.user import db
+from classes.schedule import Schedule
+from core.database import configure_sqlite
+from classes.shift_template import DEFAULT_SHIFT_TEMPLATES
+from core.utils import bulk_write_schedules
+
+DEFAULT_SIZES = [100, 1000, 10000]
+SHIFTS_PER_EMPLOYEE = 5
+
+
+def make_rows(num_employees, first_day):
+    rows = []
+    for e in range(num_employees):
+        for d in range(SHIFTS_PER_EMPLOYEE):
+            _, start_time, end_time = DEFAULT_SHIFT_TEMPLATES[(e + d) % len(DEFAULT_SHIFT_TEMPLATES)]
+            rows.append({'username': f'emp{e}', 'date': first_day + datetime.timedelta(days=d),
+                         'start_time': start_time, 'end_time': end_time})
+    return rows
+
+
+def orm_write(rows, first_day, last_day):
+    # The previous generate_shifts persistence: one ORM object per shift
+    Schedule.query.filter(Schedule.in_range(first_day, last_day)).delete()
+    for row in rows:
+        db.session.add(Schedule(**row))
+    db.session.commit()
+
+
+def bulk_write(rows, first_day, last_day):
+    bulk_write_schedules(rows, delete_range=(first_day, last_day))
+
+
+def run(sizes):
+    results = []
+    first_day = datetime.date(2030, 1, 7)
+    last_day = first_day + datetime.timedelta(days=6)
+    for num_employees in sizes:
+        rows = make_rows(num_employees, first_day)
+        for name, write in (('orm_add', orm_write), ('bulk_insert', bulk_write)):
+            with tempfile.TemporaryDirectory() as tmp:
+                app = Flask(__name__)
+                app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+                db.init_app(app)
+                with app.app_context():
+                    configure_sqlite(db.engine)
+                    db.create_all()
+                    # First write fills the week, the timed one replaces it like a regeneration
+                    write(rows, first_day, last_day)
+                    start = time.perf_counter()
+                    write(rows, first_day, last_day)
+                    elapsed = time.perf_counter() - start
+                    db.session.remove()
+                    db.engine.dispose()
+            results.append({
+                'employees': num_employees,
+                'rows': len(rows),
+                'strategy': name,
+                'seconds': round(elapsed, 4),
+                'rows_per_second': round(len(rows) / elapsed),
+            })
+            print(f'{num_employees:>6} employees  {name:<12} {len(rows) / elapsed:>12,.0f} rows/s', file=sys.stderr)
+    return results
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(json.dumps(run(sizes), indent=2))
@@ -0,0 +1,59 @@
+"""
+Measure how long a web worker takes to boot, and what the first generation adds.
+
+Run from the workscheduler folder:
+    python -m benchmarks.bench_startup [repeats]
+
+Every sample is a fresh interpreter, like a new WSGI worker: it times
+create_app() including imports, records whether OR-Tools was loaded by it, then
+times importing core.generation, the cost the first schedule generation pays.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+DEFAULT_REPEATS = 5
+
+SAMPLE = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+create_app()
+boot = time.perf_counter() - started
+ortools_at_boot = 'ortools' in sys.modules
+modules_at_boot = len(sys.modules)
+started = time.perf_counter()
+import core.generation
+print(json.dumps({'boot_seconds': boot, 'ortools_at_boot': ortools_at_boot, 'modules_at_boot': modules_at_boot,
+                  'solver_import_seconds': time.perf_counter() - started}))
+'''
+
+
+def sample(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    output = subprocess.run([sys.executable, '-c', SAMPLE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def run(repeats):
+    with tempfile.TemporaryDirectory() as tmp:
+        samples = [sample('sqlite:///' + os.path.join(tmp, 'bench.db')) for _ in range(repeats)]
+    result = {
+        'repeats': repeats,
+        'boot_seconds': round(statistics.median(s['boot_seconds'] for s in samples), 4),
+        'solver_import_seconds': round(statistics.median(s['solver_import_seconds'] for s in samples), 4),
+        'ortools_at_boot': samples[0]['ortools_at_boot'],
+        'modules_at_boot': samples[0]['modules_at_boot'],
+    }
+    print(f"boot {result['boot_seconds']:.3f}s ({result['modules_at_boot']} modules, "
+          f"ortools {'loaded' if result['ortools_at_boot'] else 'not loaded'}), "
+          f"first generation import {result['solver_import_seconds']:.3f}s", file=sys.stderr)
+    return result
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REPEATS
+    print(json.dumps(run(repeats), indent=2))
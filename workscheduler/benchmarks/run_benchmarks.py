@@ -0,0 +1,256 @@
+"""
+Benchmark schedule generation and the schedule pages on synthetic rosters.
+
+Run from the workscheduler folder:
+    python -m benchmarks.run_benchmarks                       # default scales, JSON to stdout
+    python -m benchmarks.run_benchmarks --sizes 20,100 --output before.json
+    python -m benchmarks.run_benchmarks --shifts 8                 # eight overlapping templates
+    python -m benchmarks.run_benchmarks --weights 1,10,10          # cost, fairness, weekend weights
+    python -m benchmarks.run_benchmarks --roles 4 --processes 4    # four independent job roles in parallel
+    python -m benchmarks.run_benchmarks --compare before.json after.json
+
+create_app is pointed at a temporary SQLite database (through its config) that
+is seeded the same way init_db.py does, then reseeded for every roster size.
+For each size it records model build, CP-SAT solve and persistence time from
+generate_shifts, plus end-to-end latency of /view_schedules through Flask's
+test client: admin and employee GET, and the generate POST until its
+background job finishes.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = [10, 50, 200]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def role_name(i, num_roles):
+    return f'Role {i % num_roles + 1}' if num_roles > 1 else 'Crew'
+
+
+def seed_templates(db, ShiftTemplate, num_shifts, num_roles=1):
+    """Create num_shifts overlapping 6 hour templates, staggered across 06:00 - 24:00, for each role"""
+    step = 12 * 60 // max(1, num_shifts - 1) if num_shifts > 1 else 0
+    templates = []
+    for r in range(num_roles):
+        role = role_name(r, num_roles) if num_roles > 1 else None
+        for i in range(num_shifts):
+            start = 6 * 60 + i * step
+            templates.append(ShiftTemplate(name=f'Shift {i + 1}' + (f' ({role})' if role else ''),
+                                           job_assignment=role,
+                                           start_time=datetime.time(start // 60, start % 60),
+                                           end_time=datetime.time((start // 60 + 6) % 24, start % 60)))
+    db.session.add_all(templates)
+    db.session.commit()
+    return templates
+
+
+def day_requirements_for(num_employees, templates):
+    # Roughly half the roster works each day, spread over the templates (and roles)
+    per_shift = max(1, num_employees // (2 * len(templates)))
+    return {day: {template.id: per_shift for template in templates}
+            for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')}
+
+
+def seed(db, User, Schedule, num_employees, password_hash, num_roles=1):
+    """Replace every employee and schedule with a synthetic roster"""
+    Schedule.query.delete()
+    User.query.filter(User.role != 'admin').delete()
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'emp{i}', 'password_hash': password_hash, 'first_name': 'Bench',
+         'last_name': str(i), 'hourly_rate': 15 + i % 10, 'job_assignment': role_name(i, num_roles),
+         'hire_date': '2020-01-15', 'role': 'employee', 'sick_hours': 0, 'pto_hours': 0}
+        for i in range(num_employees)
+    ])
+    db.session.commit()
+
+
+def timed_requests(client, path, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, (path, response.status_code)
+    return round(statistics.median(samples), 5)
+
+
+def wait_for_job(client, job_id, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        job = client.get(f'/schedule_jobs/{job_id}').get_json()
+        if job['status'] in ('completed', 'failed', 'cancelled'):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(f'Job {job_id} did not finish within {timeout}s')
+
+
+def run(sizes, repeat, time_limit, num_shifts=3, weights=None, num_roles=1, processes=1):
+    tmp = tempfile.TemporaryDirectory()
+    from app import create_app, db, User, Schedule
+    from classes.shift_template import ShiftTemplate
+    from core.generation import generate_shifts
+    from core.solver import get_solver_settings, get_objective_weights
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp.name, 'bench.db'),
+                      'SCHEDULE_PARTITION_PROCESSES': processes})
+    start_date = '2030-01-07'
+    results = []
+    with app.app_context():
+        db.create_all()
+        admin = User(username='admin', role='admin', first_name='Admin', last_name='User')
+        admin.set_password('password123')
+        db.session.add(admin)
+        db.session.commit()
+        password_hash = admin.password_hash
+        templates = seed_templates(db, ShiftTemplate, num_shifts, num_roles)
+
+        for num_employees in sizes:
+            seed(db, User, Schedule, num_employees, password_hash, num_roles)
+            requirements = day_requirements_for(num_employees, templates)
+            settings = get_solver_settings({'max_time_seconds': time_limit, 'deterministic': True})
+            objective_weights = get_objective_weights(weights)
+
+            stats = {}
+            start = time.perf_counter()
+            success = generate_shifts(requirements, max_shifts_per_employee=5, start_date=start_date,
+                                      solver_settings=settings, objective_weights=objective_weights,
+                                      partition_processes=processes, stats=stats)
+            total = time.perf_counter() - start
+
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['username'] = 'admin'
+                session['view_date'] = start_date
+            admin_get = timed_requests(client, '/view_schedules', repeat)
+
+            form = {'action': 'generate', 'max_shifts': 5, 'solver_time_limit': time_limit,
+                    'solver_deterministic': '1'}
+            for name, weight in objective_weights.items():
+                form[f'weight_{name}'] = weight
+            for day, counts in requirements.items():
+                for template_id, count in counts.items():
+                    form[f'demand_{template_id}_{day}'] = count
+            start = time.perf_counter()
+            response = client.post('/view_schedules', data=form)
+            post_latency = time.perf_counter() - start
+            with client.session_transaction() as session:
+                job_id = session.get('schedule_job_id')
+            job = wait_for_job(client, job_id, timeout=time_limit * 10 + 60) if job_id else None
+            post_total = time.perf_counter() - start
+
+            employee_client = app.test_client()
+            with employee_client.session_transaction() as session:
+                session['username'] = 'emp0'
+                session['view_date'] = start_date
+            employee_get = timed_requests(employee_client, '/view_schedules', repeat)
+
+            result = {
+                'employees': num_employees,
+                'feasible': success,
+                'solver_status': stats.get('solver_status'),
+                'num_variables': stats.get('num_variables'),
+                'num_templates': stats.get('num_templates'),
+                'num_partitions': stats.get('num_partitions'),
+                'rows_written': stats.get('rows_written'),
+                'labor_cost': stats.get('labor_cost'),
+                'objective': stats.get('objective'),
+                'gap': stats.get('gap'),
+                'build_seconds': round(stats.get('build_seconds', 0), 5),
+                'solve_seconds': round(stats.get('solve_seconds', 0), 5),
+                'persist_seconds': round(stats.get('persist_seconds', 0), 5),
+                'generate_total_seconds': round(total, 5),
+                'admin_get_seconds': admin_get,
+                'employee_get_seconds': employee_get,
+                'generate_post_seconds': round(post_latency, 5),
+                'generate_post_status': response.status_code,
+                'generate_job_status': job['status'] if job else None,
+                'generate_job_seconds': round(post_total, 5),
+            }
+            results.append(result)
+            print(f"{num_employees:>6} employees  build {result['build_seconds']:.3f}s  "
+                  f"solve {result['solve_seconds']:.3f}s  persist {result['persist_seconds']:.3f}s  "
+                  f"GET {admin_get * 1000:.1f}ms", file=sys.stderr)
+
+        db.session.remove()
+        db.engine.dispose()
+    tmp.cleanup()
+
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'solver_time_limit': time_limit,
+        'shift_templates': num_shifts,
+        'roles': num_roles,
+        'partition_processes': processes,
+        'objective_weights': weights,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(before_path, after_path):
+    """Print after/before ratios for every timing that appears in both runs"""
+    with open(before_path) as f:
+        before = {r['employees']: r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = json.load(f)['results']
+    for result in after:
+        base = before.get(result['employees'])
+        if base is None:
+            continue
+        print(f"{result['employees']} employees")
+        for key, value in result.items():
+            if key.endswith('_seconds') and base.get(key):
+                print(f'  {key:<24} {base[key]:>10.4f} -> {value:>10.4f}  ({value / base[key]:.2f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Comma separated roster sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='Requests per page timing (median is kept)')
+    parser.add_argument('--shifts', type=int, default=3, help='Number of overlapping shift templates')
+    parser.add_argument('--roles', type=int, default=1,
+                        help='Split the roster into this many job roles, each with its own templates')
+    parser.add_argument('--processes', type=int, default=1, help='Partitions solved at once in worker processes')
+    parser.add_argument('--weights', help='Objective weights as cost,fairness,weekend (default: feasibility only)')
+    parser.add_argument('--time-limit', type=float, default=10.0, help='Solver time limit in seconds')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Compare two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    weights = None
+    if args.weights:
+        weights = dict(zip(('cost', 'fairness', 'weekend'), (int(w) for w in args.weights.split(','))))
+    report = run([int(size) for size in args.sizes.split(',')], args.repeat, args.time_limit, args.shifts, weights,
+                 args.roles, args.processes)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
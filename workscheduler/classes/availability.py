@@ -0,0 +1,72 @@
+import datetime
+from classes.user import db
+from core.utils import end_minutes, minutes_of_day
+
+
+# Recurring weekly window an employee can work in.
+# Employees without any windows are treated as available at any time.
+class Availability(db.Model):
+    __tablename__ = 'availability'
+    __table_args__ = (
+        db.Index('ix_availability_username_weekday', 'username', 'weekday'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), db.ForeignKey('users.username'), nullable=False)
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday ... 6 = Sunday
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+
+    def covers(self, start_time, end_time):
+        """True if a shift from start_time to end_time fits inside this window"""
+        return minutes_of_day(self.start_time) <= minutes_of_day(start_time) and \
+            end_minutes(start_time, end_time) <= end_minutes(self.start_time, self.end_time)
+
+
+# Dated time off request (PTO, sick leave or unpaid); only approved requests block scheduling
+class TimeOff(db.Model):
+    __tablename__ = 'time_off'
+    __table_args__ = (
+        db.Index('ix_time_off_status_dates', 'status', 'start_date', 'end_date'),
+    )
+    KINDS = ('pto', 'sick', 'unpaid')
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), db.ForeignKey('users.username'), nullable=False, index=True)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    kind = db.Column(db.String(20), nullable=False, default='pto')
+    hours = db.Column(db.Float, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, approved, denied
+    note = db.Column(db.String(200))
+
+    # Query helper for requests overlapping an inclusive date range
+    @classmethod
+    def overlapping(cls, start, end):
+        return db.and_(cls.start_date <= end, cls.end_date >= start)
+
+
+# Per-solve lookup of who can work when, built with two queries
+class AvailabilityIndex:
+    def __init__(self, usernames, first_day, last_day):
+        self.windows = {}
+        for window in Availability.query.filter(Availability.username.in_(usernames)).all():
+            self.windows.setdefault(window.username, {}).setdefault(window.weekday, []).append(window)
+
+        self.days_off = {}
+        approved = TimeOff.query.filter(
+            TimeOff.username.in_(usernames),
+            TimeOff.status == 'approved',
+            TimeOff.overlapping(first_day, last_day)
+        ).all()
+        for time_off in approved:
+            day = max(time_off.start_date, first_day)
+            while day <= min(time_off.end_date, last_day):
+                self.days_off.setdefault(time_off.username, set()).add(day)
+                day += datetime.timedelta(days=1)
+
+    def can_work(self, username, day, start_time, end_time):
+        if day in self.days_off.get(username, ()):
+            return False
+        windows = self.windows.get(username)
+        if windows is None:
+            return True
+        return any(window.covers(start_time, end_time) for window in windows.get(day.weekday(), ()))
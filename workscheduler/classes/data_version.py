@@ -0,0 +1,31 @@
+import datetime
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.sqlite import insert
+from classes.user import db
+
+
+# Change counter for a slice of data, e.g. 'week:2030-01-07' or 'employees'.
+# API responses derive their ETag and Last-Modified from these rows.
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    scope = db.Column(db.String(40), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    @classmethod
+    def bump(cls, scopes):
+        """Increment every scope in the current transaction with one upsert, the caller commits"""
+        scopes = sorted(set(scopes))
+        if not scopes:
+            return
+        now = datetime.datetime.utcnow()
+        statement = insert(cls).values(scope=bindparam('scope_name'), version=1, updated_at=now)
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.scope], set_={'version': cls.version + 1, 'updated_at': now})
+        db.session.execute(statement, [{'scope_name': scope} for scope in scopes])
+
+    @classmethod
+    def lookup(cls, scopes):
+        """{scope: (version, updated_at)} for the scopes that have changed at least once"""
+        rows = db.session.query(cls.scope, cls.version, cls.updated_at).filter(cls.scope.in_(list(scopes))).all()
+        return {scope: (version, updated_at) for scope, version, updated_at in rows}
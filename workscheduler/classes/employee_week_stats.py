@@ -0,0 +1,81 @@
+import datetime
+from sqlalchemy import func, insert
+from classes.user import User, db
+from classes.schedule import Schedule
+
+
+# Shifts, hours and labor cost per employee per week (weeks start on Monday).
+# core.changes keeps the rows in step with the schedules in the same transaction,
+# so reports read one row per employee and week instead of every shift.
+class EmployeeWeekStats(db.Model):
+    __tablename__ = 'employee_week_stats'
+    week_start = db.Column(db.Date, primary_key=True)
+    username = db.Column(db.String(80), db.ForeignKey('users.username'), primary_key=True)
+    shifts = db.Column(db.Integer, nullable=False, default=0)
+    hours = db.Column(db.Float, nullable=False, default=0)
+    labor_cost = db.Column(db.Float, nullable=False, default=0)  # hours at the employee's current hourly rate
+
+    @staticmethod
+    def totals(rows, key):
+        """
+        Add up shift rows
+
+        Args:
+            rows (iterable): (username, date, start_time, end_time, hourly_rate) tuples
+            key (callable): Maps (username, date) to the group a shift is counted in
+
+        Returns:
+            dict: {group: [shifts, hours, labor_cost]}
+        """
+        totals = {}
+        for username, day, start_time, end_time, hourly_rate in rows:
+            hours = Schedule.duration_hours(start_time, end_time)
+            total = totals.setdefault(key(username, day), [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += hours
+            total[2] += hours * (hourly_rate or 0)
+        return totals
+
+    @staticmethod
+    def shift_rows(start, end, usernames=None):
+        """Query of (username, date, start_time, end_time, hourly_rate) for the shifts in a date range"""
+        query = db.session.query(Schedule.username, Schedule.date, Schedule.start_time, Schedule.end_time,
+                                 User.hourly_rate).join(User, User.username == Schedule.username).filter(
+            Schedule.in_range(start, end))
+        if usernames is not None:
+            query = query.filter(Schedule.username.in_(usernames))
+        return query
+
+    @classmethod
+    def refresh(cls, weeks, usernames=None):
+        """
+        Recompute the rows of some weeks from the schedules, the caller commits
+
+        Args:
+            weeks (iterable): Mondays of the weeks to recompute
+            usernames (iterable, optional): Only recompute these employees, None for everyone
+        """
+        weeks = sorted(set(weeks))
+        if not weeks:
+            return
+        usernames = None if usernames is None else sorted(set(usernames))
+        stale = cls.query.filter(cls.week_start.in_(weeks))
+        if usernames is not None:
+            stale = stale.filter(cls.username.in_(usernames))
+        stale.delete(synchronize_session=False)
+
+        wanted = set(weeks)
+        rows = (row for row in cls.shift_rows(weeks[0], weeks[-1] + datetime.timedelta(days=6), usernames)
+                if row[1] - datetime.timedelta(days=row[1].weekday()) in wanted)
+        totals = cls.totals(rows, lambda username, day: (day - datetime.timedelta(days=day.weekday()), username))
+        if totals:
+            db.session.execute(insert(cls), [
+                {'week_start': week, 'username': username, 'shifts': shifts, 'hours': hours, 'labor_cost': cost}
+                for (week, username), (shifts, hours, cost) in totals.items()])
+
+    @classmethod
+    def reprice(cls, usernames):
+        """Recompute labor_cost from hours after hourly rates changed, the caller commits"""
+        rate = db.session.query(User.hourly_rate).filter(User.username == cls.username).scalar_subquery()
+        cls.query.filter(cls.username.in_(list(usernames))).update(
+            {cls.labor_cost: cls.hours * func.coalesce(rate, 0)}, synchronize_session=False)
@@ -1,11 +1,47 @@
+import datetime
 from classes.user import db
 
 
 # Schedule model
 class Schedule(db.Model):
     __tablename__ = 'schedules'
+    # Week lookups filter on a date range first, then group or filter by employee
+    __table_args__ = (
+        db.Index('ix_schedules_date_username', 'date', 'username'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), db.ForeignKey('users.username'), nullable=False)
-    date = db.Column(db.String(20), nullable=False)
-    start_time = db.Column(db.String(10), nullable=False)
-    end_time = db.Column(db.String(10), nullable=False)
\ No newline at end of file
+    date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+
+    @property
+    def start_at(self):
+        return datetime.datetime.combine(self.date, self.start_time)
+
+    @property
+    def end_at(self):
+        # Shifts that end at or before they start run past midnight
+        end = datetime.datetime.combine(self.date, self.end_time)
+        if self.end_time <= self.start_time:
+            end += datetime.timedelta(days=1)
+        return end
+
+    @property
+    def hours(self):
+        return self.duration_hours(self.start_time, self.end_time)
+
+    # Length of a shift in hours from its start and end times, without loading the row
+    @staticmethod
+    def duration_hours(start_time, end_time):
+        seconds = (end_time.hour * 3600 + end_time.minute * 60 + end_time.second) - \
+            (start_time.hour * 3600 + start_time.minute * 60 + start_time.second)
+        # Shifts that end at or before they start run past midnight
+        if seconds <= 0:
+            seconds += 24 * 3600
+        return seconds / 3600
+
+    # Query helper for an inclusive date range
+    @classmethod
+    def in_range(cls, start, end):
+        return cls.date.between(start, end)
@@ -0,0 +1,98 @@
+import datetime
+from classes.user import db
+from core.utils import end_minutes, minutes_of_day
+
+# (name, start, end) of the templates seeded into new databases, each needed once a day
+DEFAULT_SHIFT_TEMPLATES = [
+    ('Opening', datetime.time(8, 0), datetime.time(13, 0)),
+    ('Midday', datetime.time(12, 0), datetime.time(17, 0)),
+    ('Closing', datetime.time(16, 0), datetime.time(22, 0)),
+]
+
+
+# A named shift that schedules are generated from, e.g. Opening 08:00 - 13:00
+class ShiftTemplate(db.Model):
+    __tablename__ = 'shift_templates'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), unique=True, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    # Only employees with this job assignment / location can work it, blank accepts anyone
+    job_assignment = db.Column(db.String(80))
+    location = db.Column(db.String(80))
+    demands = db.relationship('ShiftDemand', backref='template', lazy=True, cascade='all, delete-orphan')
+
+    @property
+    def start_minutes(self):
+        return minutes_of_day(self.start_time)
+
+    @property
+    def end_minutes(self):
+        return end_minutes(self.start_time, self.end_time)
+
+    @property
+    def hours(self):
+        return (self.end_minutes - self.start_minutes) / 60
+
+    def overlaps(self, other):
+        """True if both templates, worked on the same day, would overlap"""
+        return self.start_minutes < other.end_minutes and other.start_minutes < self.end_minutes
+
+    def accepts(self, employee):
+        """True if the employee's job assignment and location match the template's"""
+        return (not self.job_assignment or self.job_assignment == employee.job_assignment) and \
+            (not self.location or self.location == employee.location)
+
+    # All templates in the order they appear on the generation form
+    @classmethod
+    def ordered(cls):
+        return cls.query.order_by(cls.start_time, cls.end_time, cls.id).all()
+
+
+# How many employees a template needs on a given weekday (0 = Monday ... 6 = Sunday)
+class ShiftDemand(db.Model):
+    __tablename__ = 'shift_demand'
+    __table_args__ = (
+        db.UniqueConstraint('template_id', 'weekday', name='uq_shift_demand_template_weekday'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('shift_templates.id'), nullable=False)
+    weekday = db.Column(db.Integer, nullable=False)
+    required = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def requirements(cls, templates, days):
+        """
+        Stored demand as {day name: {template id: employees needed}}
+
+        Args:
+            templates (list): ShiftTemplate rows to include; missing demand counts as zero
+            days (list): Day names, Monday first
+        """
+        stored = {(demand.template_id, demand.weekday): demand.required for demand in cls.query.all()}
+        return {day: {template.id: stored.get((template.id, weekday), 0) for template in templates}
+                for weekday, day in enumerate(days)}
+
+    @classmethod
+    def save_requirements(cls, day_requirements, days):
+        """Store {day name: {template id: employees needed}}, creating missing rows"""
+        stored = {(demand.template_id, demand.weekday): demand for demand in cls.query.all()}
+        for weekday, day in enumerate(days):
+            for template_id, required in day_requirements.get(day, {}).items():
+                demand = stored.get((template_id, weekday))
+                if demand is None:
+                    db.session.add(cls(template_id=template_id, weekday=weekday, required=required))
+                else:
+                    demand.required = required
+        db.session.commit()
+
+
+# Create the default templates in an empty database
+def seed_default_templates(required=1):
+    if ShiftTemplate.query.first() is not None:
+        return
+    for name, start_time, end_time in DEFAULT_SHIFT_TEMPLATES:
+        template = ShiftTemplate(name=name, start_time=start_time, end_time=end_time)
+        template.demands = [ShiftDemand(weekday=weekday, required=required) for weekday in range(7)]
+        db.session.add(template)
+    db.session.commit()
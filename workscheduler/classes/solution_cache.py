@@ -0,0 +1,72 @@
+import datetime
+import hashlib
+import json
+from classes.user import db
+
+
+# Solved schedules keyed by a hash of everything the solver was given.
+# Identical regenerations write the stored rows instead of solving again.
+class SolutionCache(db.Model):
+    __tablename__ = 'solution_cache'
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of the canonical inputs
+    assignments = db.Column(db.Text, nullable=False)  # JSON [[username, date, start, end], ...]
+    solver_status = db.Column(db.String(20), nullable=False)
+    objective = db.Column(db.Float)
+    best_bound = db.Column(db.Float)
+    labor_cost = db.Column(db.Float)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow, index=True)
+
+    @staticmethod
+    def make_key(inputs):
+        """sha256 of a JSON-serializable description of the solver inputs"""
+        canonical = json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    @property
+    def rows(self):
+        """Stored assignments as Schedule column dicts for bulk_write_schedules"""
+        return [{'username': username, 'date': datetime.date.fromisoformat(day),
+                 'start_time': datetime.time.fromisoformat(start), 'end_time': datetime.time.fromisoformat(end)}
+                for username, day, start, end in json.loads(self.assignments)]
+
+    # Look up a solution and mark it as recently used
+    @classmethod
+    def lookup(cls, key):
+        entry = db.session.get(cls, key)
+        if entry is not None:
+            entry.hits += 1
+            entry.last_used_at = datetime.datetime.utcnow()
+            db.session.commit()
+        return entry
+
+    @classmethod
+    def store(cls, key, rows, solver_status, max_entries, objective=None, best_bound=None, labor_cost=None):
+        """
+        Remember a solution, evicting the least recently used entries beyond max_entries
+
+        Args:
+            key (str): Key from make_key
+            rows (list): Schedule column dicts that were written
+            solver_status (str): CP-SAT status name of the solve
+            max_entries (int): Cache size, 0 disables caching
+        """
+        if max_entries <= 0:
+            return
+        assignments = json.dumps([[row['username'], row['date'].isoformat(), row['start_time'].isoformat(),
+                                   row['end_time'].isoformat()] for row in rows])
+        db.session.merge(cls(key=key, assignments=assignments, solver_status=solver_status, objective=objective,
+                             best_bound=best_bound, labor_cost=labor_cost, hits=0,
+                             created_at=datetime.datetime.utcnow(), last_used_at=datetime.datetime.utcnow()))
+        db.session.flush()
+        stale = db.session.query(cls.key).order_by(cls.last_used_at.desc()).offset(max_entries).all()
+        if stale:
+            cls.query.filter(cls.key.in_([key for key, in stale])).delete(synchronize_session=False)
+        db.session.commit()
+
+    # Forget every cached solution, e.g. after an employee was edited or deleted
+    @classmethod
+    def clear(cls):
+        cls.query.delete()
+        db.session.commit()
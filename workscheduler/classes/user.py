@@ -17,8 +17,11 @@ class User(db.Model):
     pto_hours = db.Column(db.Float, default=0)
     hourly_rate = db.Column(db.Float)
     job_assignment = db.Column(db.String(80))
+    location = db.Column(db.String(80))  # Site the employee works at, matched against shift templates
     hire_date = db.Column(db.String(20))
     role = db.Column(db.String(20), default='employee')
+    # Inactive employees stay on the roster but are left out of schedule generation
+    active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true(), index=True)
     schedules = db.relationship('Schedule', backref='user', lazy=True)
 
     # Password methods
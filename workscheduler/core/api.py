@@ -0,0 +1,227 @@
+import base64
+import datetime
+import hashlib
+import json
+from flask import Blueprint, Response, request
+from sqlalchemy import and_, or_
+from classes.user import User, db
+from classes.schedule import Schedule
+from classes.data_version import DataVersion
+from core.changes import week_scopes
+from core.decorators import get_current_user
+from core.reports import payroll_report, weekly_labor_report
+
+# Read-only JSON API for kiosks and mobile clients.
+# Responses carry an ETag and Last-Modified built from DataVersion counters, so a
+# poller sending If-None-Match gets a 304 after a single small query.
+api = Blueprint('api', __name__, url_prefix='/api')
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+MAX_RANGE_DAYS = 366
+# Reports read weekly rollups, so they can cover years
+MAX_REPORT_RANGE_DAYS = 5 * 366
+
+SCHEDULE_FIELDS = ['id', 'username', 'date', 'start_time', 'end_time']
+EMPLOYEE_FIELDS = ['username', 'first_name', 'last_name', 'job_assignment', 'location', 'active']
+PAYROLL_FIELDS = ['username', 'first_name', 'last_name', 'job_assignment', 'location', 'hourly_rate', 'shifts',
+                  'hours', 'labor_cost', 'pto_taken', 'sick_taken', 'unpaid_taken', 'pto_balance', 'sick_balance']
+WEEKLY_LABOR_FIELDS = ['week_start', 'shifts', 'hours', 'labor_cost']
+
+
+def compact_json(payload, status=200):
+    return Response(json.dumps(payload, separators=(',', ':'), default=str), status=status,
+                    mimetype='application/json')
+
+
+def error(message, status=400):
+    return compact_json({'status': 'error', 'message': message}, status)
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def decode_schedule_cursor(cursor):
+    """(date, id) of the last schedule on the previous page, ValueError if the cursor is malformed"""
+    values = decode_cursor(cursor)
+    if not (isinstance(values, list) and len(values) == 2 and isinstance(values[0], str)
+            and isinstance(values[1], int) and not isinstance(values[1], bool)):
+        raise ValueError('Expected a [date, id] cursor')
+    return datetime.date.fromisoformat(values[0]), values[1]
+
+
+def decode_employee_cursor(cursor):
+    """Username of the last employee on the previous page, ValueError if the cursor is malformed"""
+    value = decode_cursor(cursor)
+    if not isinstance(value, str):
+        raise ValueError('Expected a username cursor')
+    return value
+
+
+def page_size():
+    limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit
+
+
+def conditional(scopes, build):
+    """
+    Answer a GET from the version counters of the scopes it depends on
+
+    Args:
+        scopes (list): DataVersion scopes the response is built from
+        build (callable): Returns the JSON payload, only called when the client's copy is stale
+
+    Returns:
+        Response: 304 Not Modified, or the payload with ETag and Last-Modified headers
+    """
+    versions = DataVersion.lookup(scopes)
+    # The same URL returns different rows to different users, so they never share an ETag
+    user = get_current_user()
+    fingerprint = json.dumps([sorted((scope, version) for scope, (version, _) in versions.items()),
+                              sorted(request.args.items(multi=True)), request.path, user.username, user.role])
+    etag = hashlib.sha1(fingerprint.encode()).hexdigest()
+    last_modified = max((updated_at for _, updated_at in versions.values()), default=None)
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=datetime.timezone.utc)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = since is not None and last_modified is not None and last_modified <= since
+
+    response = Response(status=304) if not_modified else compact_json(build())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Clients may keep the response but must revalidate it every time
+    response.cache_control.no_cache = True
+    return response
+
+
+# Every API call needs a logged in user; answer with JSON rather than the login page
+@api.before_request
+def require_login():
+    if get_current_user() is None:
+        return error('Login required', 401)
+
+
+# Responses depend on who is logged in, so shared caches must not store them
+@api.after_request
+def mark_private(response):
+    response.cache_control.private = True
+    response.vary.add('Cookie')
+    return response
+
+
+# Route to list schedules in a date range, employees only see their own
+@api.route('/schedules')
+def list_schedules():
+    user = get_current_user()
+    try:
+        today = datetime.date.today()
+        start = datetime.date.fromisoformat(request.args.get('start', today.isoformat()))
+        end = datetime.date.fromisoformat(request.args.get('end', (start + datetime.timedelta(days=6)).isoformat()))
+        limit = page_size()
+        cursor = request.args.get('cursor')
+        after = decode_schedule_cursor(cursor) if cursor else None
+    except (TypeError, ValueError):
+        return error('Expected start and end as YYYY-MM-DD, a valid cursor and limit')
+    if end < start or (end - start).days >= MAX_RANGE_DAYS:
+        return error(f'end must be on or after start and at most {MAX_RANGE_DAYS} days later')
+
+    username = request.args.get('username')
+    if user.role != 'admin':
+        if username not in (None, user.username):
+            return error('Access denied', 403)
+        username = user.username
+
+    def build():
+        query = db.session.query(Schedule.id, Schedule.username, Schedule.date, Schedule.start_time,
+                                 Schedule.end_time).filter(Schedule.in_range(start, end))
+        if username:
+            query = query.filter(Schedule.username == username)
+        if after:
+            after_date, after_id = after
+            query = query.filter(or_(Schedule.date > after_date,
+                                     and_(Schedule.date == after_date, Schedule.id > after_id)))
+        rows = query.order_by(Schedule.date, Schedule.id).limit(limit + 1).all()
+        next_cursor = encode_cursor([rows[limit - 1].date.isoformat(), rows[limit - 1].id]) \
+            if len(rows) > limit else None
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'fields': SCHEDULE_FIELDS,
+            'rows': [[row.id, row.username, row.date.isoformat(), row.start_time.strftime('%H:%M'),
+                      row.end_time.strftime('%H:%M')] for row in rows[:limit]],
+            'next_cursor': next_cursor,
+        }
+
+    return conditional(week_scopes(start, end), build)
+
+
+# Route to list employees (Admin only)
+@api.route('/employees')
+def list_employees():
+    if get_current_user().role != 'admin':
+        return error('Access denied', 403)
+    try:
+        limit = page_size()
+        cursor = request.args.get('cursor')
+        after = decode_employee_cursor(cursor) if cursor else None
+    except (TypeError, ValueError):
+        return error('Expected a valid cursor and limit')
+
+    def build():
+        query = db.session.query(User.username, User.first_name, User.last_name, User.job_assignment,
+                                 User.location, User.active).filter(User.role != 'admin')
+        if after:
+            query = query.filter(User.username > after)
+        rows = query.order_by(User.username).limit(limit + 1).all()
+        return {
+            'fields': EMPLOYEE_FIELDS,
+            'rows': [list(row) for row in rows[:limit]],
+            'next_cursor': encode_cursor(rows[limit - 1].username) if len(rows) > limit else None,
+        }
+
+    return conditional(['employees'], build)
+
+
+# Route to report hours, labor cost and time off per employee or per week (Admin only).
+# Responses are built from the weekly rollup and revalidate like the other endpoints.
+@api.route('/reports/<report>')
+def labor_report(report):
+    if get_current_user().role != 'admin':
+        return error('Access denied', 403)
+    if report not in ('payroll', 'weekly'):
+        return error('Unknown report, expected payroll or weekly', 404)
+    try:
+        today = datetime.date.today()
+        start = datetime.date.fromisoformat(request.args.get('start', today.replace(day=1).isoformat()))
+        end = datetime.date.fromisoformat(request.args.get('end', today.isoformat()))
+    except (TypeError, ValueError):
+        return error('Expected start and end as YYYY-MM-DD')
+    if end < start or (end - start).days >= MAX_REPORT_RANGE_DAYS:
+        return error(f'end must be on or after start and at most {MAX_REPORT_RANGE_DAYS} days later')
+
+    def build():
+        if report == 'payroll':
+            fields, rows = PAYROLL_FIELDS, payroll_report(start, end)
+        else:
+            fields, rows = WEEKLY_LABOR_FIELDS, weekly_labor_report(start, end)
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'fields': fields,
+            'rows': [[row[field] for field in fields] for row in rows],
+        }
+
+    return conditional(week_scopes(start, end) + ['employees', 'time_off'], build)
@@ -0,0 +1,67 @@
+import datetime
+from classes.data_version import DataVersion
+from classes.employee_week_stats import EmployeeWeekStats
+from core.events import queue_event
+
+# Central hooks for data changes. Every code path that writes schedules or employees
+# calls one of these after its writes and before committing, so anything derived
+# from the data (API versions, the weekly hours rollup) is updated in the same transaction,
+# and live schedule pages are notified once it commits.
+
+
+def week_start(day):
+    """Monday of the week containing day"""
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def week_scopes(first_day, last_day):
+    """DataVersion scopes of every week overlapping first_day..last_day"""
+    week = week_start(first_day)
+    scopes = []
+    while week <= last_day:
+        scopes.append(f'week:{week.isoformat()}')
+        week += datetime.timedelta(weeks=1)
+    return scopes
+
+
+def schedules_changed(dates, usernames=None, shifts=None, deleted=None):
+    """
+    Record that schedules on these dates were added, edited or removed
+
+    Pages showing an affected week are sent the changed shifts and deleted shift
+    ids when the caller passes them, otherwise they are told to reload the week.
+
+    Args:
+        dates (iterable): Days whose shifts changed
+        usernames (iterable, optional): The only employees whose shifts changed, None for anyone
+        shifts (list, optional): Changed shifts as shift_to_dict dicts
+        deleted (list, optional): Ids of deleted shifts
+    """
+    weeks = {week_start(day) for day in dates}
+    usernames = None if usernames is None else sorted(set(usernames))
+    DataVersion.bump(f'week:{week.isoformat()}' for week in weeks)
+    EmployeeWeekStats.refresh(weeks, usernames)
+
+    if shifts is None and deleted is None:
+        change = {'refresh': True, 'usernames': usernames}
+    else:
+        change = {'shifts': shifts or [], 'deleted': deleted or [], 'usernames': usernames}
+    for week in weeks:
+        queue_event(f'week:{week.isoformat()}', dict(change, week=week.isoformat()))
+
+
+def employees_changed(repriced=None):
+    """
+    Record that the employee list or an employee's details changed
+
+    Args:
+        repriced (iterable, optional): Employees whose hourly rate may have changed
+    """
+    if repriced:
+        EmployeeWeekStats.reprice(repriced)
+    DataVersion.bump(['employees'])
+
+
+def time_off_changed():
+    """Record that a time off request was approved, denied or cancelled"""
+    DataVersion.bump(['time_off'])
@@ -0,0 +1,96 @@
+import os
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from classes.user import db
+
+# Used when DATABASE_URL is not set; a relative SQLite path lives in the instance folder
+DEFAULT_DATABASE_URL = 'sqlite:///scheduler.db'
+
+# Only SQLite is supported: the schema version is kept in PRAGMA user_version
+# (core/migrations.py) and DataVersion.bump uses SQLite's upsert
+SUPPORTED_BACKENDS = ('sqlite',)
+
+# Pragmas applied to every new SQLite connection.
+# WAL lets page views keep reading while a generation job writes,
+# and synchronous=NORMAL is safe in WAL mode while avoiding an fsync per commit.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+def check_database_url(url):
+    """Raise ValueError unless url points at a supported database"""
+    backend = make_url(url).get_backend_name()
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f'Unsupported database {backend!r} in DATABASE_URL, only SQLite is supported.')
+
+
+def configure_sqlite(engine, pragmas=None):
+    """Register a connect hook that sets pragmas on an SQLite engine"""
+    pragmas = DEFAULT_SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def engine_options(url, environ=None):
+    """
+    SQLAlchemy engine options for a database URL, tuned by environment variables
+
+    Every worker process has its own pool, so DB_POOL_SIZE + DB_MAX_OVERFLOW
+    should cover the threads one worker serves.
+
+    Args:
+        url (str): Database URL
+        environ (dict, optional): Variables to read instead of os.environ
+
+    Returns:
+        dict: Value for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    environ = os.environ if environ is None else environ
+    url = make_url(url)
+    options = {}
+    # In-memory SQLite uses a single shared connection, there is no pool to size
+    if url.database in (None, '', ':memory:'):
+        return options
+    options['pool_size'] = int(environ.get('DB_POOL_SIZE', 5))
+    options['max_overflow'] = int(environ.get('DB_MAX_OVERFLOW', 10))
+    options['pool_timeout'] = float(environ.get('DB_POOL_TIMEOUT', 30))
+    return options
+
+
+def database_config(environ=None):
+    """
+    Database settings for app.config from environment variables
+
+    DATABASE_URL picks the SQLite database file and SQLITE_BUSY_TIMEOUT_MS sets how long an
+    SQLite write waits for another worker's lock before failing. The pool is sized
+    by init_database once the final database URL is known.
+    """
+    environ = os.environ if environ is None else environ
+    return {
+        'SQLALCHEMY_DATABASE_URI': environ.get('DATABASE_URL', DEFAULT_DATABASE_URL),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLITE_PRAGMAS': dict(DEFAULT_SQLITE_PRAGMAS,
+                               busy_timeout=int(environ.get('SQLITE_BUSY_TIMEOUT_MS',
+                                                            DEFAULT_SQLITE_PRAGMAS['busy_timeout']))),
+    }
+
+
+def init_database(app):
+    """Bind db to an app configured with database_config and set the SQLite pragmas on its engine"""
+    check_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    db.init_app(app)
+    with app.app_context():
+        configure_sqlite(db.engine, app.config.get('SQLITE_PRAGMAS'))
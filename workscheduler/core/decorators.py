@@ -1,13 +1,84 @@
+import threading
+import time
 from functools import wraps
-from flask import session, redirect, url_for
+from flask import session, redirect, url_for, g, current_app
 from classes.user import User
+from core.metrics import span
+
+
+# Short-lived cache of each user's role, shared by the requests a worker serves.
+# Edits and deletions call invalidate_user; other workers catch up once the TTL expires.
+class RoleCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roles = {}
+
+    def get(self, username):
+        with self._lock:
+            entry = self._roles.get(username)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, username, role):
+        ttl = current_app.config.get('USER_CACHE_TTL_SECONDS', 30)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._roles[username] = (role, time.monotonic() + ttl)
+
+    def invalidate(self, username=None):
+        with self._lock:
+            if username is None:
+                self._roles.clear()
+            else:
+                self._roles.pop(username, None)
+
+
+role_cache = RoleCache()
+
+
+def invalidate_user(username):
+    """Forget cached data for a user after it is edited or deleted"""
+    role_cache.invalidate(username)
+    if g.get('current_user') is not None and g.current_user.username == username:
+        g.pop('current_user')
+
+
+def get_current_user():
+    """The logged-in User, loaded at most once per request"""
+    if 'current_user' not in g:
+        username = session.get('username')
+        with span('current_user_lookup'):
+            g.current_user = User.query.filter_by(username=username).first() if username else None
+        if g.current_user is not None:
+            role_cache.set(username, g.current_user.role)
+    return g.current_user
+
+
+def get_current_role():
+    """The logged-in user's role, from the request or the role cache before touching the database"""
+    if g.get('current_user') is not None:
+        return g.current_user.role
+    username = session.get('username')
+    if username is None:
+        return None
+    role = role_cache.get(username)
+    if role is None:
+        user = get_current_user()
+        role = user.role if user else None
+    return role
 
 # Decorator to protect routes that require login
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'username' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
+        # Sessions of deleted users are no longer valid
+        if get_current_role() is None:
+            session.pop('username', None)
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -15,8 +86,9 @@ def login_required(f):
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user = User.query.filter_by(username=session.get('username')).first()
-        if not user or user.role != 'admin':
-            return redirect(url_for('login'))
+        with span('admin_check'):
+            role = get_current_role()
+        if role != 'admin':
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
@@ -0,0 +1,135 @@
+import json
+import queue
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from classes.user import db
+
+# In-process publish/subscribe for live schedule updates.
+# The change hooks queue events on the database session and they are published
+# once the transaction commits, so a subscriber never sees a change that was
+# rolled back. Subscribers only hear about writes made by the same process.
+
+PENDING_EVENTS_KEY = 'pending_events'
+
+
+# One listener's queue of events for a topic
+class Subscription:
+    def __init__(self, topic, max_queued, refresh_payload):
+        self.topic = topic
+        self.refresh_payload = refresh_payload
+        self._queue = queue.Queue(max_queued)
+        self._overflowed = False
+
+    def put(self, payload):
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            # A slow client missed events; it gets one refresh instead of the backlog
+            self._overflowed = True
+
+    def get(self, timeout):
+        """The next event payload, or None if nothing arrived within timeout seconds"""
+        if self._overflowed:
+            self._overflowed = False
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            return self.refresh_payload
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics = {}
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._topics.values())
+
+    def subscribe(self, topic, max_subscribers=None, max_queued=100, refresh_payload=None):
+        """
+        A new Subscription to topic, or None if max_subscribers are already listening
+
+        refresh_payload is delivered in place of the events a slow listener missed;
+        it defaults to {'refresh': True, 'usernames': None}.
+        """
+        with self._lock:
+            if max_subscribers is not None and \
+                    sum(len(subscriptions) for subscriptions in self._topics.values()) >= max_subscribers:
+                return None
+            if refresh_payload is None:
+                refresh_payload = {'refresh': True, 'usernames': None}
+            subscription = Subscription(topic, max_queued, refresh_payload)
+            self._topics.setdefault(topic, set()).add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._topics.get(subscription.topic)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic, payload):
+        with self._lock:
+            subscriptions = list(self._topics.get(topic, ()))
+        for subscription in subscriptions:
+            subscription.put(payload)
+
+
+event_bus = EventBus()
+
+
+def queue_event(topic, payload):
+    """Publish payload to topic when the current database transaction commits"""
+    db.session.info.setdefault(PENDING_EVENTS_KEY, []).append((topic, payload))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending_events(session):
+    for topic, payload in session.info.pop(PENDING_EVENTS_KEY, []):
+        event_bus.publish(topic, payload)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending_events(session, previous_transaction):
+    session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+def iter_event_stream(subscription, keepalive_seconds=15, max_seconds=300, select=None):
+    """
+    Yield a subscription's events in server-sent events format
+
+    The stream ends after max_seconds so a connection does not hold a server
+    thread forever; EventSource reconnects on its own. A comment line is sent
+    after keepalive_seconds of silence so proxies keep the connection open.
+
+    Args:
+        subscription (Subscription): Unsubscribed when the stream ends or the client goes away
+        keepalive_seconds (float): Longest silence between two writes
+        max_seconds (float): Lifetime of the stream
+        select (callable, optional): Maps each payload to what this client is sent, None to skip it
+    """
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            payload = subscription.get(min(keepalive_seconds, remaining))
+            if payload is not None and select is not None:
+                payload = select(payload)
+            if payload is None:
+                yield ': keepalive\n\n'
+            else:
+                yield f"data: {json.dumps(payload, separators=(',', ':'), default=str)}\n\n"
+    finally:
+        event_bus.unsubscribe(subscription)
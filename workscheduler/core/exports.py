@@ -0,0 +1,107 @@
+import csv
+import datetime
+import io
+from sqlalchemy import and_, or_
+from classes.user import User, db
+from classes.schedule import Schedule
+
+# Rows fetched per query while streaming, so memory stays flat for any date range
+EXPORT_BATCH_SIZE = 1000
+
+SCHEDULE_CSV_FIELDS = ['date', 'username', 'first_name', 'last_name', 'job_assignment',
+                       'start_time', 'end_time', 'hours']
+
+
+def iter_schedule_batches(start, end, username=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield schedules in a date range as lists of joined rows, keyset-paged on (date, id)
+
+    Each batch is its own short query, so a long download never holds one
+    read open for the whole range.
+
+    Args:
+        start (datetime.date): First day, inclusive
+        end (datetime.date): Last day, inclusive
+        username (str, optional): Only this employee's shifts
+        batch_size (int): Rows per query
+    """
+    after = None
+    while True:
+        query = db.session.query(Schedule, User.first_name, User.last_name, User.job_assignment).join(
+            User, User.username == Schedule.username).filter(Schedule.in_range(start, end))
+        if username:
+            query = query.filter(Schedule.username == username)
+        if after:
+            query = query.filter(or_(Schedule.date > after[0], and_(Schedule.date == after[0], Schedule.id > after[1])))
+        rows = query.order_by(Schedule.date, Schedule.id).limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        after = (rows[-1][0].date, rows[-1][0].id)
+        # Let the identity map forget the batch we just streamed
+        db.session.expunge_all()
+        if len(rows) < batch_size:
+            return
+
+
+def iter_schedules_csv(start, end, username=None):
+    """Yield a CSV export of schedules one batch of lines at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SCHEDULE_CSV_FIELDS)
+    for rows in iter_schedule_batches(start, end, username):
+        for shift, first_name, last_name, job_assignment in rows:
+            writer.writerow([shift.date.isoformat(), shift.username, first_name, last_name, job_assignment,
+                             shift.start_time.strftime('%H:%M'), shift.end_time.strftime('%H:%M'),
+                             f'{shift.hours:g}'])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ics_text(value):
+    return str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_time(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def iter_schedule_ics(username, start, end, host='workscheduler'):
+    """
+    Yield an iCalendar feed of one employee's shifts
+
+    Times are written as floating local times, the same wall-clock times the
+    schedule pages show. Event UIDs are stable per shift, so calendar apps
+    update edited shifts in place when the feed is imported again.
+
+    Args:
+        username (str): Employee whose shifts are exported
+        start (datetime.date): First day, inclusive
+        end (datetime.date): Last day, inclusive
+        host (str): Domain part of the event UIDs
+    """
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield '\r\n'.join([
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Work Scheduler//Shifts//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_ics_text(f"Shifts for {username}")}',
+    ]) + '\r\n'
+    for rows in iter_schedule_batches(start, end, username):
+        lines = []
+        for shift, _, _, job_assignment in rows:
+            lines += [
+                'BEGIN:VEVENT',
+                f'UID:shift-{shift.id}@{host}',
+                f'DTSTAMP:{stamp}',
+                f'DTSTART:{_ics_time(shift.start_at)}',
+                f'DTEND:{_ics_time(shift.end_at)}',
+                f'SUMMARY:{_ics_text(f"Shift ({job_assignment})" if job_assignment else "Shift")}',
+                'END:VEVENT',
+            ]
+        yield '\r\n'.join(lines) + '\r\n'
+    yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,325 @@
+import datetime
+import time
+from ortools.sat.python import cp_model
+from classes.user import User
+from classes.schedule import Schedule
+from classes.availability import AvailabilityIndex
+from classes.shift_template import ShiftDemand, ShiftTemplate
+from classes.solution_cache import SolutionCache
+from core.metrics import record_phase
+from core.parallel import solve_models_in_processes
+from core.schedule_model import ScheduleModel, ScheduleProblem, explain_infeasibility
+from core.solver import configure_solver, get_solver_settings, objective_gap
+from core.utils import DAYS, bulk_write_schedules, closest_template, get_range_dates
+
+# Schedule generation with OR-Tools CP-SAT.
+# Importing this module loads the solver stack (ortools, numpy, pandas), so the web
+# app imports it on the first generation instead of at startup.
+
+# Solution callback that reports solver progress to a background job
+class JobProgressCallback(cp_model.CpSolverSolutionCallback):
+    def __init__(self, job, has_objective=False):
+        super().__init__()
+        self.job = job
+        self.has_objective = has_objective
+
+    def on_solution_callback(self):
+        # Objective values are only meaningful once the model has an objective
+        if self.has_objective:
+            self.job.record_solution(self.ObjectiveValue(), self.BestObjectiveBound())
+        else:
+            self.job.record_solution()
+        if self.job.cancel_requested:
+            self.StopSearch()
+
+# Solve one partition's model in this process, reporting progress to the job
+def solve_in_process(schedule_model, solver_settings, job=None):
+    """
+    Returns:
+        tuple: (status name, assigned (e, d, s) keys or None without a solution, objective, best bound)
+    """
+    model = schedule_model.model
+    solver = configure_solver(cp_model.CpSolver(), solver_settings)
+    if job is not None:
+        job.attach_solver(solver)
+        status = solver.Solve(model, JobProgressCallback(job, model.HasObjective()))
+        job.attach_solver(None)
+    else:
+        status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return solver.StatusName(status), None, None, None
+    # Read the whole solution vector once rather than calling solver.Value per variable
+    solution = solver.ResponseProto().solution
+    assigned = [key for key, var in schedule_model.shifts.items() if solution[var.Index()]]
+    if not model.HasObjective():
+        return solver.StatusName(status), assigned, None, None
+    return solver.StatusName(status), assigned, solver.ObjectiveValue(), solver.BestObjectiveBound()
+
+# Solve every partition, in worker processes when there is more than one and processes allow it
+def solve_partition_models(schedule_models, solver_settings, processes=1, job=None):
+    """
+    Args:
+        schedule_models (list): ScheduleModel per partition
+        solver_settings (dict): Settings from get_solver_settings, applied to each solve
+        processes (int): Partitions solved at the same time; 1 solves them one after another
+            in this process, with live progress and cancellation
+        job (ScheduleJob, optional): Background job to report progress to
+
+    Returns:
+        list: solve_in_process results in the same order, or None if the job was cancelled
+    """
+    if processes > 1 and len(schedule_models) > 1:
+        keys = [list(schedule_model.shifts) for schedule_model in schedule_models]
+        results = solve_models_in_processes(
+            [(schedule_model.model, [var.Index() for var in schedule_model.shifts.values()])
+             for schedule_model in schedule_models], solver_settings, processes, job)
+        if results is None:
+            return None
+        return [(status, None if values is None else [key for key, value in zip(model_keys, values) if value],
+                 objective, best_bound)
+                for (status, values, objective, best_bound), model_keys in zip(results, keys)]
+
+    results = []
+    for schedule_model in schedule_models:
+        if job is not None and job.cancel_requested:
+            return None
+        results.append(solve_in_process(schedule_model, solver_settings, job))
+    return results
+
+# Status of the whole schedule from the partition statuses, e.g. FEASIBLE if any partition stopped early
+def combined_status(statuses):
+    for status in statuses:
+        if status not in ('OPTIMAL', 'FEASIBLE'):
+            return 'INFEASIBLE' if 'INFEASIBLE' in statuses else status
+    return 'FEASIBLE' if 'FEASIBLE' in statuses else 'OPTIMAL'
+
+# Function to generate shifts using OR-Tools
+def generate_shifts(day_requirements=None, max_shifts_per_employee=5, active_employees=None, start_date=None,
+                    job=None, solver_settings=None, num_weeks=1, min_rest_hours=0, repair=False, stats=None,
+                    templates=None, max_shifts_per_day=1, objective_weights=None, diagnose=False,
+                    cache_size=0, partition_processes=1):
+    """
+    Generate shifts for one or more consecutive weeks in a single solve
+    
+    Args:
+        day_requirements (dict, optional): {day name: {template id: employees needed}}, reused
+            for every week. Defaults to the demand stored with the shift templates
+        max_shifts_per_employee (int): Maximum shifts per employee in any rolling 7 days
+        active_employees (list, optional): Restrict generation to these usernames; inactive
+            employees are always left out
+        start_date (str): Start date in 'YYYY-MM-DD' format
+        job (ScheduleJob, optional): Background job to report progress to; a cancelled
+            job never writes schedules
+        solver_settings (dict, optional): Settings from get_solver_settings, defaults to the app config
+        num_weeks (int): Number of consecutive weeks to generate
+        min_rest_hours (float): Minimum hours between the end of one shift and the start of the next
+        repair (bool): Start from the schedules already in the range and change as few
+            shifts as possible, only rewriting the rows that changed
+        stats (dict, optional): Filled with phase timings and model size, for benchmarks, and
+            with 'diagnosis' (a list of reasons) when no schedule exists
+        templates (list, optional): ShiftTemplate rows to schedule, defaults to all of them
+        max_shifts_per_day (int): Shifts one employee may work on a day; they never overlap
+        objective_weights (dict, optional): Weights from get_objective_weights. Any non-zero weight
+            turns on optimization of labor cost and fairness; repair keeps its minimal-change objective
+        diagnose (bool): When the solve proves there is no schedule, solve again with assumption
+            literals to find which requirements conflict
+        cache_size (int): Keep up to this many solutions in SolutionCache and reuse them for
+            identical inputs; 0 disables the cache. Repair runs are never cached.
+        partition_processes (int): Independent partitions (employees and templates that never
+            share a shift, e.g. separate job assignments or locations) solved at the same time in
+            worker processes; 1 solves them one after another in this process
+    """
+    if job is not None:
+        job.set_phase('building')
+    if stats is None:
+        stats = {}
+    started = time.perf_counter()
+    solver_settings = solver_settings or get_solver_settings()
+
+    range_dates = get_range_dates(start_date, num_weeks)
+    first_day, last_day = range_dates[0], range_dates[-1]
+    
+    # Only active employees are scheduled, optionally narrowed by active_employees
+    query = User.query.filter(User.role != 'admin', User.active.is_(True))
+    if active_employees is not None:
+        query = query.filter(User.username.in_(active_employees))
+    employees = query.order_by(User.username).all()
+    
+    if templates is None:
+        templates = ShiftTemplate.ordered()
+    if not employees or not templates:
+        return False
+    if day_requirements is None:
+        day_requirements = ShiftDemand.requirements(templates, DAYS)
+    demand = [[day_requirements[DAYS[day.weekday()]].get(template.id, 0) for template in templates]
+              for day in range_dates]
+    employee_index = {emp.username: e for e, emp in enumerate(employees)}
+
+    # Shifts already scheduled in the six days either side of the range still
+    # count towards rolling limits and rest time across the range boundaries
+    six_days = datetime.timedelta(days=6)
+    neighbours = Schedule.query.filter(
+        Schedule.username.in_(list(employee_index)),
+        Schedule.in_range(first_day - six_days, last_day + six_days),
+        ~Schedule.in_range(first_day, last_day)
+    ).all()
+    # Keyed by day offset relative to the start of the range, so -1 is the day before it
+    outside_shifts = {}
+    for shift in neighbours:
+        outside_shifts.setdefault((employee_index[shift.username], (shift.date - first_day).days), []).append(shift)
+
+    # Only triples the employee can actually work get a variable: templates for another job
+    # assignment or location, availability windows and approved time off prune the model
+    # before the solver ever sees it
+    availability = AvailabilityIndex(list(employee_index), first_day, last_day)
+    eligible = [[template.accepts(employee) for template in templates] for employee in employees]
+    candidates = [(e, d, s) for e, employee in enumerate(employees) for d, day in enumerate(range_dates)
+                  for s, template in enumerate(templates)
+                  if eligible[e][s] and availability.can_work(employee.username, day, template.start_time,
+                                                              template.end_time)]
+    problem = ScheduleProblem(employees, templates, range_dates, demand, candidates,
+                              max_shifts_per_employee=max_shifts_per_employee,
+                              max_shifts_per_day=max_shifts_per_day, min_rest_hours=min_rest_hours,
+                              outside_shifts=outside_shifts)
+
+    # Groups of employees and templates that never share a variable (e.g. cooks and cashiers)
+    # are solved as separate models
+    partitions = problem.partitions()
+
+    # Demand no roster of this size could cover is reported without building a model
+    shortfalls = [message for partition, _, _ in partitions for message in partition.capacity_shortfalls()]
+    if shortfalls:
+        stats['solver_status'] = 'INFEASIBLE'
+        stats['diagnosis'] = shortfalls
+        return False
+
+    # Identical inputs (roster, availability, demand, neighbouring shifts, settings) reuse the stored solution
+    cache_key = None
+    if cache_size and not repair:
+        cache_key = SolutionCache.make_key({'problem': problem.fingerprint(), 'solver': solver_settings,
+                                            'weights': objective_weights or {}})
+        cached = SolutionCache.lookup(cache_key)
+        if cached is not None:
+            new_rows = cached.rows
+            bulk_write_schedules(new_rows, delete_range=(first_day, last_day))
+            stats.update(cached=True, solver_status=cached.solver_status, labor_cost=cached.labor_cost,
+                         rows_written=len(new_rows), build_seconds=time.perf_counter() - started)
+            if cached.objective is not None:
+                stats.update(objective=cached.objective, best_bound=cached.best_bound,
+                             gap=objective_gap(cached.objective, cached.best_bound))
+            if job is not None:
+                job.solver_status = cached.solver_status
+                job.record_result(cached.objective, cached.best_bound)
+            return True
+
+    # In repair mode the current schedules for the range seed the solver
+    existing_rows = []
+    existing = {}
+    if repair:
+        existing_rows = Schedule.query.filter(Schedule.in_range(first_day, last_day)).all()
+        for row in existing_rows:
+            e = employee_index.get(row.username)
+            if e is not None:
+                s = closest_template(templates, row.start_time, row.end_time)
+                existing.setdefault((e, (row.date - first_day).days, s), row)
+        # Shifts the employee can no longer work (inactive, time off, ...) are always dropped
+        candidate_keys = set(candidates)
+        existing = {key: row for key, row in existing.items() if key in candidate_keys}
+    dropped = len(existing_rows) - len(existing)
+
+    # One model per partition; a partition nobody is needed for has nothing to solve
+    weighted = bool(objective_weights) and any(objective_weights.values())
+    models = []
+    for partition, employee_ids, template_ids in partitions:
+        employee_map = {e: i for i, e in enumerate(employee_ids)}
+        template_map = {s: i for i, s in enumerate(template_ids)}
+        local_existing = {(employee_map[e], d, template_map[s]): row
+                          for (e, d, s), row in existing.items() if e in employee_map}
+        if not partition.total_demand:
+            dropped += len(local_existing)
+            continue
+        schedule_model = ScheduleModel(partition)
+        if repair:
+            schedule_model.add_repair_objective(local_existing)
+        elif weighted:
+            schedule_model.add_weighted_objective(objective_weights)
+        models.append((schedule_model, employee_ids, template_ids))
+
+    stats['num_variables'] = sum(len(schedule_model.shifts) for schedule_model, _, _ in models)
+    stats['num_templates'] = len(templates)
+    stats['num_partitions'] = len(models)
+    stats['largest_partition_variables'] = max((len(m.shifts) for m, _, _ in models), default=0)
+    stats['build_seconds'] = time.perf_counter() - started
+    record_phase('model_build', stats['build_seconds'])
+
+    # Solve the models
+    started = time.perf_counter()
+    if job is not None:
+        job.set_phase('solving')
+    results = solve_partition_models([schedule_model for schedule_model, _, _ in models], solver_settings,
+                                     processes=partition_processes, job=job)
+    if results is None or (job is not None and job.cancel_requested):
+        return False
+    status_name = combined_status([status for status, _, _, _ in results])
+    if job is not None:
+        job.solver_status = status_name
+        job.set_phase('saving')
+    stats['solve_seconds'] = time.perf_counter() - started
+    record_phase('solve', stats['solve_seconds'])
+    stats['solver_status'] = status_name
+
+    if status_name in ('OPTIMAL', 'FEASIBLE'):
+        # Partition objectives add up; repair also counts the shifts that had to be dropped
+        if repair or any(schedule_model.model.HasObjective() for schedule_model, _, _ in models):
+            stats['objective'] = dropped + sum(objective or 0 for _, _, objective, _ in results)
+            stats['best_bound'] = dropped + sum(best_bound or 0 for _, _, _, best_bound in results)
+            stats['gap'] = objective_gap(stats['objective'], stats['best_bound'])
+            if job is not None:
+                job.record_result(stats['objective'], stats['best_bound'])
+
+        started = time.perf_counter()
+        assigned = []
+        labor_cost = 0
+        for (schedule_model, employee_ids, template_ids), (_, local_assigned, _, _) in zip(models, results):
+            for e, d, s in local_assigned:
+                assigned.append((employee_ids[e], d, template_ids[s]))
+                labor_cost += schedule_model.shift_cost(e, s)
+        stats['labor_cost'] = labor_cost / 100
+
+        if repair:
+            # Only touch the rows that changed, unchanged shifts keep their ids and edited times
+            kept_rows = {existing[key].id for key in assigned if key in existing}
+            delete_ids = [row.id for row in existing_rows if row.id not in kept_rows]
+            assigned = [key for key in assigned if key not in existing]
+            delete_range = None
+        else:
+            # Clear existing schedules for the whole range, all weeks and partitions are written in one transaction
+            delete_ids = None
+            delete_range = (first_day, last_day)
+
+        new_rows = [
+            {'username': employees[e].username, 'date': range_dates[d],
+             'start_time': templates[s].start_time, 'end_time': templates[s].end_time}
+            for e, d, s in sorted(assigned, key=lambda key: (key[1], key[0], key[2]))
+        ]
+        bulk_write_schedules(new_rows, delete_range=delete_range, delete_ids=delete_ids)
+        if cache_key is not None:
+            SolutionCache.store(cache_key, new_rows, stats['solver_status'], cache_size,
+                                objective=stats.get('objective'), best_bound=stats.get('best_bound'),
+                                labor_cost=stats['labor_cost'])
+        stats['persist_seconds'] = time.perf_counter() - started
+        record_phase('persist', stats['persist_seconds'])
+        stats['rows_written'] = len(new_rows)
+        return True
+
+    if status_name == 'INFEASIBLE' and diagnose:
+        if job is not None:
+            job.set_phase('diagnosing')
+        started = time.perf_counter()
+        # Only the partitions without a schedule need explaining, and each is smaller than the whole
+        stats['diagnosis'] = [reason for (schedule_model, _, _), (status, _, _, _) in zip(models, results)
+                              if status == 'INFEASIBLE'
+                              for reason in explain_infeasibility(schedule_model.problem, solver_settings, job)]
+        stats['diagnose_seconds'] = time.perf_counter() - started
+        record_phase('diagnose', stats['diagnose_seconds'])
+    return False
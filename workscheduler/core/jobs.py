@@ -0,0 +1,185 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from core.solver import objective_gap
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+# A single background schedule generation request
+class ScheduleJob:
+    def __init__(self, params=None):
+        self.id = uuid.uuid4().hex
+        self.params = params or {}
+        self.status = QUEUED
+        self.phase = None
+        self.message = None
+        self.solutions = 0
+        self.objective = None
+        self.best_bound = None
+        self.solver_status = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._solver = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def set_phase(self, phase):
+        self.phase = phase
+
+    def attach_solver(self, solver):
+        """
+        Remember the running CP-SAT solver so a cancel can interrupt it.
+        If a cancel arrived before the solve started, stop it straight away.
+        """
+        with self._lock:
+            self._solver = solver
+            if solver is not None and self._cancel_event.is_set():
+                solver.StopSearch()
+
+    def record_solution(self, objective=None, best_bound=None):
+        """Called from the solver callback every time an improving solution is found"""
+        with self._lock:
+            self.solutions += 1
+            self.objective = objective
+            self.best_bound = best_bound
+
+    def record_result(self, objective, best_bound):
+        """Final objective and bound once the solve has finished"""
+        with self._lock:
+            self.objective = objective
+            self.best_bound = best_bound
+
+    @property
+    def gap(self):
+        return objective_gap(self.objective, self.best_bound)
+
+    def cancel(self):
+        with self._lock:
+            self._cancel_event.set()
+            if self._solver is not None:
+                self._solver.StopSearch()
+
+    def to_dict(self):
+        now = self.finished_at or time.time()
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'phase': self.phase,
+            'message': self.message,
+            'solutions': self.solutions,
+            'objective': self.objective,
+            'best_bound': self.best_bound,
+            'gap': self.gap,
+            'solver_status': self.solver_status,
+            'elapsed': round(now - (self.started_at or now), 3),
+            'created_at': self.created_at,
+        }
+
+
+# In-process job store backed by a thread pool.
+# CP-SAT releases the GIL while solving, so threads are enough to keep
+# the Flask workers free while a solve is running.
+class JobManager:
+    def __init__(self, max_workers=2, keep_finished=100):
+        self.max_workers = max_workers
+        self.keep_finished = keep_finished
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='schedule-job')
+        return self._executor
+
+    def submit(self, app, func, params=None):
+        """
+        Queue func(job) to run inside an application context.
+
+        Args:
+            app (Flask): Application the worker thread should push a context for
+            func (callable): Called with the job, returns (success, message)
+            params (dict, optional): Request parameters kept for status reporting
+
+        Returns:
+            ScheduleJob: The queued job
+        """
+        job = ScheduleJob(params)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            executor = self._get_executor()
+        executor.submit(self._run, app, func, job)
+        return job
+
+    def _run(self, app, func, job):
+        if job.cancel_requested:
+            job.message = 'Schedule generation cancelled.'
+            job.finished_at = time.time()
+            job.status = CANCELLED
+            return
+
+        job.status = RUNNING
+        job.started_at = time.time()
+        status, message = FAILED, 'Schedule generation failed.'
+        try:
+            with app.app_context():
+                success, message = func(job)
+            if job.cancel_requested:
+                status, message = CANCELLED, 'Schedule generation cancelled.'
+            else:
+                status = COMPLETED if success else FAILED
+        except Exception as exc:
+            app.logger.exception('Schedule job %s failed', job.id)
+            status, message = FAILED, f'Schedule generation failed: {exc}'
+        finally:
+            job.attach_solver(None)
+            job.phase = None
+            job.message = message
+            # The status goes last: once a job reads as finished, everything else is in place
+            job.finished_at = time.time()
+            job.status = status
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if not job.finished:
+            job.cancel()
+        return job
+
+    def _prune(self):
+        # Forget the oldest finished jobs so the store does not grow forever
+        finished = [job for job in self._jobs.values() if job.finished]
+        if len(finished) <= self.keep_finished:
+            return
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:len(finished) - self.keep_finished]:
+            del self._jobs[job.id]
+
+
+schedule_jobs = JobManager()
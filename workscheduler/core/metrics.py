@@ -0,0 +1,153 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+# In-process metric registry rendered in the Prometheus text format.
+# Each worker process keeps its own numbers, like the job store in core/jobs.py.
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._help[name] = (kind, help_text, buckets)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._help.get(name, (None, None, DURATION_BUCKETS))[2] or DURATION_BUCKETS
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        described = set()
+
+        def header(name, default_kind):
+            if name in described:
+                return
+            described.add(name)
+            kind, help_text, _ = self._help.get(name, (default_kind, None, None))
+            if help_text:
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+        for (name, labels), histogram in histograms:
+            header(name, 'histogram')
+            buckets = self._help.get(name, (None, None, DURATION_BUCKETS))[2] or DURATION_BUCKETS
+            for bound, count in zip(buckets, histogram['buckets']):
+                lines.append(f'{name}_bucket{_format_labels(labels, ("le", bound))} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels, ("le", "+Inf"))} {histogram["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {histogram["sum"]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('workscheduler_http_requests_total', 'counter', 'HTTP requests by endpoint and status')
+metrics.describe('workscheduler_http_request_duration_seconds', 'histogram', 'HTTP request latency')
+metrics.describe('workscheduler_http_request_queries', 'histogram', 'SQL queries issued per HTTP request',
+                 COUNT_BUCKETS)
+metrics.describe('workscheduler_db_queries_total', 'counter', 'SQL statements executed')
+metrics.describe('workscheduler_db_query_duration_seconds', 'histogram', 'SQL statement latency')
+metrics.describe('workscheduler_phase_duration_seconds', 'histogram',
+                 'Time spent in instrumented phases (password check, solver build/solve/persist, ...)')
+
+
+def record_phase(phase, seconds):
+    """Record a timed phase, and remember it on the current request for the slow log"""
+    metrics.observe('workscheduler_phase_duration_seconds', seconds, phase=phase)
+    if has_request_context():
+        g.setdefault('phase_timings', []).append((phase, seconds))
+
+
+@contextmanager
+def span(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    source = 'request' if has_request_context() else 'background'
+    metrics.inc('workscheduler_db_queries_total', source=source)
+    metrics.observe('workscheduler_db_query_duration_seconds', elapsed, source=source)
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        g.query_seconds = g.get('query_seconds', 0.0) + elapsed
+
+
+def init_metrics(app, engine):
+    """Register request timing hooks on the app and query timing on the engine"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.query_count = 0
+        g.query_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'request_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_start
+        endpoint = request.endpoint or 'unknown'
+        metrics.inc('workscheduler_http_requests_total', method=request.method, endpoint=endpoint,
+                    status=response.status_code)
+        metrics.observe('workscheduler_http_request_duration_seconds', elapsed,
+                        method=request.method, endpoint=endpoint)
+        metrics.observe('workscheduler_http_request_queries', g.query_count, endpoint=endpoint)
+
+        slow_after = app.config.get('SLOW_REQUEST_SECONDS')
+        if slow_after is not None and elapsed >= slow_after:
+            phases = ', '.join(f'{name}={seconds:.3f}s' for name, seconds in g.get('phase_timings', []))
+            app.logger.warning('Slow request: %s %s took %.3fs (%d queries, %.3fs in SQL)%s',
+                               request.method, request.path, elapsed, g.query_count, g.query_seconds,
+                               f' [{phases}]' if phases else '')
+        return response
@@ -0,0 +1,241 @@
+import datetime
+from sqlalchemy import inspect, text
+from classes.employee_week_stats import EmployeeWeekStats
+from classes.shift_template import DEFAULT_SHIFT_TEMPLATES
+
+# Schema migrations for existing SQLite databases.
+# The schema version is kept in SQLite's PRAGMA user_version; a database made
+# by init_db.py on the current models is stamped with the latest version.
+
+
+def _parse_date(value):
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return datetime.datetime.strptime(value.strip(), '%Y-%m-%d').date().isoformat()
+
+
+def _parse_time(value):
+    # Stored in the same format SQLAlchemy writes for TIME columns on SQLite
+    value = value.strip()
+    fmt = '%H:%M:%S' if value.count(':') == 2 else '%H:%M'
+    return datetime.datetime.strptime(value.split('.')[0], fmt).strftime('%H:%M:%S.000000')
+
+
+def native_schedule_types(conn):
+    """Rebuild schedules with DATE/TIME columns and convert the stored strings"""
+    if not inspect(conn).has_table('schedules'):
+        return
+    rows = conn.exec_driver_sql('SELECT id, username, date, start_time, end_time FROM schedules').fetchall()
+    converted = [
+        {'id': row.id, 'username': row.username, 'date': _parse_date(row.date),
+         'start_time': _parse_time(row.start_time), 'end_time': _parse_time(row.end_time)}
+        for row in rows
+    ]
+    conn.exec_driver_sql('DROP INDEX IF EXISTS ix_schedules_date_username')
+    conn.exec_driver_sql('ALTER TABLE schedules RENAME TO schedules_old')
+    conn.exec_driver_sql('''
+        CREATE TABLE schedules (
+            id INTEGER NOT NULL,
+            username VARCHAR(80) NOT NULL,
+            date DATE NOT NULL,
+            start_time TIME NOT NULL,
+            end_time TIME NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(username) REFERENCES users (username)
+        )''')
+    if converted:
+        conn.execute(text('INSERT INTO schedules (id, username, date, start_time, end_time) '
+                          'VALUES (:id, :username, :date, :start_time, :end_time)'), converted)
+    conn.exec_driver_sql('DROP TABLE schedules_old')
+    conn.exec_driver_sql('CREATE INDEX ix_schedules_date_username ON schedules (date, username)')
+
+
+def employee_active_flag(conn):
+    """Add the indexed users.active flag that replaces the per-session disabled list"""
+    columns = {column['name'] for column in inspect(conn).get_columns('users')}
+    if 'active' not in columns:
+        conn.exec_driver_sql('ALTER TABLE users ADD COLUMN active BOOLEAN NOT NULL DEFAULT 1')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_users_active ON users (active)')
+
+
+def availability_tables(conn):
+    """Add recurring availability windows and dated time off requests"""
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS availability (
+            id INTEGER NOT NULL,
+            username VARCHAR(80) NOT NULL,
+            weekday INTEGER NOT NULL,
+            start_time TIME NOT NULL,
+            end_time TIME NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(username) REFERENCES users (username)
+        )''')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_availability_username_weekday '
+                         'ON availability (username, weekday)')
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS time_off (
+            id INTEGER NOT NULL,
+            username VARCHAR(80) NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            kind VARCHAR(20) NOT NULL,
+            hours FLOAT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            note VARCHAR(200),
+            PRIMARY KEY (id),
+            FOREIGN KEY(username) REFERENCES users (username)
+        )''')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_time_off_username ON time_off (username)')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_time_off_status_dates '
+                         'ON time_off (status, start_date, end_date)')
+
+
+def shift_templates(conn):
+    """Move the hard-coded opening/midday/closing shifts into editable templates"""
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS shift_templates (
+            id INTEGER NOT NULL,
+            name VARCHAR(80) NOT NULL,
+            start_time TIME NOT NULL,
+            end_time TIME NOT NULL,
+            PRIMARY KEY (id),
+            UNIQUE (name)
+        )''')
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS shift_demand (
+            id INTEGER NOT NULL,
+            template_id INTEGER NOT NULL,
+            weekday INTEGER NOT NULL,
+            required INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            CONSTRAINT uq_shift_demand_template_weekday UNIQUE (template_id, weekday),
+            FOREIGN KEY(template_id) REFERENCES shift_templates (id)
+        )''')
+    if conn.exec_driver_sql('SELECT COUNT(*) FROM shift_templates').scalar():
+        return
+    for name, start_time, end_time in DEFAULT_SHIFT_TEMPLATES:
+        template_id = conn.execute(
+            text('INSERT INTO shift_templates (name, start_time, end_time) VALUES (:name, :start, :end)'),
+            {'name': name, 'start': _parse_time(start_time.strftime('%H:%M')),
+             'end': _parse_time(end_time.strftime('%H:%M'))}
+        ).lastrowid
+        conn.execute(text('INSERT INTO shift_demand (template_id, weekday, required) VALUES (:id, :weekday, 1)'),
+                     [{'id': template_id, 'weekday': weekday} for weekday in range(7)])
+
+
+def solution_cache(conn):
+    """Add the table of cached solver results"""
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS solution_cache (
+            "key" VARCHAR(64) NOT NULL,
+            assignments TEXT NOT NULL,
+            solver_status VARCHAR(20) NOT NULL,
+            objective FLOAT,
+            best_bound FLOAT,
+            labor_cost FLOAT,
+            hits INTEGER NOT NULL,
+            created_at DATETIME NOT NULL,
+            last_used_at DATETIME NOT NULL,
+            PRIMARY KEY ("key")
+        )''')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_solution_cache_last_used_at '
+                         'ON solution_cache (last_used_at)')
+
+
+def data_versions(conn):
+    """Add the change counters behind API ETags"""
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            scope VARCHAR(40) NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at DATETIME NOT NULL,
+            PRIMARY KEY (scope)
+        )''')
+
+
+def partition_columns(conn):
+    """Add employee locations and the role/location a shift template is staffed from"""
+    user_columns = {column['name'] for column in inspect(conn).get_columns('users')}
+    if 'location' not in user_columns:
+        conn.exec_driver_sql('ALTER TABLE users ADD COLUMN location VARCHAR(80)')
+    template_columns = {column['name'] for column in inspect(conn).get_columns('shift_templates')}
+    for column in ('job_assignment', 'location'):
+        if column not in template_columns:
+            conn.exec_driver_sql(f'ALTER TABLE shift_templates ADD COLUMN {column} VARCHAR(80)')
+
+
+def employee_week_stats(conn):
+    """Add the weekly hours and labor cost rollup and fill it from the existing schedules"""
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS employee_week_stats (
+            week_start DATE NOT NULL,
+            username VARCHAR(80) NOT NULL,
+            shifts INTEGER NOT NULL,
+            hours FLOAT NOT NULL,
+            labor_cost FLOAT NOT NULL,
+            PRIMARY KEY (week_start, username),
+            FOREIGN KEY(username) REFERENCES users (username)
+        )''')
+    conn.exec_driver_sql('DELETE FROM employee_week_stats')
+    rows = conn.exec_driver_sql(
+        'SELECT s.username, s.date, s.start_time, s.end_time, u.hourly_rate '
+        'FROM schedules s JOIN users u ON u.username = s.username').fetchall()
+    parsed = [(username, datetime.date.fromisoformat(_parse_date(day)),
+               datetime.time.fromisoformat(_parse_time(start_time)),
+               datetime.time.fromisoformat(_parse_time(end_time)), hourly_rate)
+              for username, day, start_time, end_time, hourly_rate in rows]
+    totals = EmployeeWeekStats.totals(
+        parsed, lambda username, day: ((day - datetime.timedelta(days=day.weekday())).isoformat(), username))
+    if totals:
+        conn.execute(text('INSERT INTO employee_week_stats (week_start, username, shifts, hours, labor_cost) '
+                          'VALUES (:week_start, :username, :shifts, :hours, :labor_cost)'),
+                     [{'week_start': week, 'username': username, 'shifts': shifts, 'hours': hours,
+                       'labor_cost': cost} for (week, username), (shifts, hours, cost) in totals.items()])
+
+
+# (version, description, migration function), in order
+MIGRATIONS = [
+    (1, 'Store schedule dates and times as DATE/TIME', native_schedule_types),
+    (2, 'Add an indexed active flag to users', employee_active_flag),
+    (3, 'Add availability and time off tables', availability_tables),
+    (4, 'Add shift templates and per-day demand', shift_templates),
+    (5, 'Add the solver result cache', solution_cache),
+    (6, 'Add data version counters for API caching', data_versions),
+    (7, 'Add locations and per-role shift templates', partition_columns),
+    (8, 'Add the weekly hours and labor cost rollup', employee_week_stats),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def stamp_schema(engine, version=SCHEMA_VERSION):
+    """Mark a database as already being on the given schema version"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f'PRAGMA user_version = {int(version)}')
+
+
+def upgrade_schema(engine, log=print):
+    """
+    Apply every migration newer than the database's schema version.
+    Each migration runs in its own transaction together with its version bump.
+
+    Returns:
+        int: Number of migrations applied
+    """
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+
+    applied = 0
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        log(f'Migrating to schema version {version}: {description}')
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.exec_driver_sql(f'PRAGMA user_version = {int(version)}')
+        applied += 1
+    return applied
@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from ortools.sat.python import cp_model
+from core.solver import configure_solver
+
+# Solve independent CP-SAT models in worker processes.
+# Models are sent as text-format CpModelProto (the pybind proto in this OR-Tools
+# release has no binary serialization) and only the values of the literals the
+# caller asks for come back. Workers are started with spawn so they never inherit
+# the web process's threads, sockets or database connections.
+#
+# One pool of a fixed size is shared by every job in the process; concurrent
+# generations queue their partitions on it. A manager process carries the stop
+# event and progress reports between the job thread and the workers.
+
+_pool = None
+_pool_size = 0
+_manager = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(processes):
+    """(pool, pool size, manager): the process-wide pool, created with `processes` workers and never resized"""
+    global _pool, _pool_size, _manager
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+            _pool_size = processes
+            if _manager is None:
+                _manager = context.Manager()
+        return _pool, _pool_size, _manager
+
+
+def _discard_broken_pool(pool):
+    # A worker died (e.g. killed for memory); every future of that pool has failed,
+    # so start a fresh pool on the next call
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+# Forwards improving solutions from a worker to the job thread
+class _ProgressCallback(cp_model.CpSolverSolutionCallback):
+    def __init__(self, index, progress, has_objective):
+        super().__init__()
+        self.index = index
+        self.progress = progress
+        self.has_objective = has_objective
+
+    def on_solution_callback(self):
+        if self.has_objective:
+            self.progress.put((self.index, self.ObjectiveValue(), self.BestObjectiveBound()))
+        else:
+            self.progress.put((self.index, None, None))
+
+
+def solve_model_text(model_text, solver_settings, literals, index=0, stop=None, progress=None):
+    """
+    Solve a text-format CpModelProto, runs in a worker process
+
+    Args:
+        stop (Event proxy, optional): Set by the job thread to interrupt the search
+        progress (Queue proxy, optional): Receives (index, objective, best bound) per improving solution
+
+    Returns:
+        tuple: (status name, values of literals as 0/1 or None if no solution, objective, best bound)
+    """
+    model = cp_model.CpModel()
+    model.Proto().parse_text_format(model_text)
+    solver = configure_solver(cp_model.CpSolver(), solver_settings)
+    done = threading.Event()
+    if stop is not None:
+        def stop_when_cancelled():
+            while not done.is_set():
+                if stop.wait(0.2):
+                    solver.StopSearch()
+                    return
+        threading.Thread(target=stop_when_cancelled, daemon=True).start()
+    try:
+        if progress is not None:
+            status = solver.Solve(model, _ProgressCallback(index, progress, model.HasObjective()))
+        else:
+            status = solver.Solve(model)
+    finally:
+        done.set()
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return solver.StatusName(status), None, None, None
+    solution = solver.ResponseProto().solution
+    objective = solver.ObjectiveValue() if model.HasObjective() else None
+    best_bound = solver.BestObjectiveBound() if model.HasObjective() else None
+    return solver.StatusName(status), [solution[literal] for literal in literals], objective, best_bound
+
+
+def _drain_progress(progress, latest, job):
+    """Report the summed objective and bound of the partitions that have a solution so far"""
+    reported = False
+    while True:
+        try:
+            index, objective, best_bound = progress.get_nowait()
+        except queue.Empty:
+            break
+        latest[index] = (objective, best_bound)
+        reported = True
+    if reported and job is not None:
+        values = list(latest.values())
+        if all(objective is not None for objective, _ in values):
+            job.record_solution(sum(objective for objective, _ in values),
+                                sum(best_bound for _, best_bound in values))
+        else:
+            job.record_solution()
+
+
+def solve_models_in_processes(models, solver_settings, processes, job=None, poll_seconds=0.5):
+    """
+    Solve several independent models at once in the shared process pool
+
+    Args:
+        models (list): (CpModel, literal indices) pairs
+        solver_settings (dict): Settings from get_solver_settings; num_workers=0 is
+            replaced by an equal share of the cores so the processes do not oversubscribe them
+        processes (int): Size of the process pool, fixed by the first call in this process
+        job (ScheduleJob, optional): Receives progress and solution counts; a cancel
+            interrupts the partitions being solved and drops the ones not started yet
+
+    Returns:
+        list: solve_model_text results in the order of models, None for every model
+        if the job was cancelled
+    """
+    pool, pool_size, manager = _get_pool(processes)
+    settings = dict(solver_settings)
+    if not settings['num_workers']:
+        settings['num_workers'] = max(1, (os.cpu_count() or 1) // pool_size)
+
+    stop = manager.Event()
+    progress = manager.Queue()
+    latest = {}
+    try:
+        futures = {pool.submit(solve_model_text, str(model.Proto()), settings, literals, i, stop, progress): i
+                   for i, (model, literals) in enumerate(models)}
+        results = [None] * len(models)
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+            _drain_progress(progress, latest, job)
+            if job is not None:
+                if job.cancel_requested:
+                    stop.set()
+                    for future in pending:
+                        future.cancel()
+                    # Partitions already running stop at their next check; wait so the
+                    # workers are free for the next job
+                    wait(pending)
+                    return None
+                job.set_phase(f'solving ({len(models) - len(pending)}/{len(models)} partitions done)')
+        return results
+    except BrokenProcessPool:
+        _discard_broken_pool(pool)
+        raise
+    finally:
+        stop.set()
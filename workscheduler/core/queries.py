@@ -0,0 +1,44 @@
+from sqlalchemy import and_
+from classes.user import User, db
+from classes.schedule import Schedule
+
+
+# Schedules for every employee in one round-trip, for the admin grid
+def get_week_grid(week_dates):
+    """
+    Fetch the schedule grid for a week with a single joined query
+
+    Args:
+        week_dates (list): datetime.date objects for the week
+
+    Returns:
+        dict: schedules[username][date] -> list of Schedule by start time (an employee
+        can work split shifts), with an empty dict for employees who have no shifts that week
+    """
+    rows = db.session.query(User.username, Schedule).outerjoin(
+        Schedule,
+        and_(Schedule.username == User.username, Schedule.in_range(week_dates[0], week_dates[-1]))
+    ).filter(User.role != 'admin').order_by(User.username, Schedule.date, Schedule.start_time).all()
+
+    schedules = {}
+    for username, shift in rows:
+        date_to_shifts = schedules.setdefault(username, {})
+        if shift is not None:
+            date_to_shifts.setdefault(shift.date, []).append(shift)
+    return schedules
+
+
+# Schedules for a single employee, keyed by date with a list of shifts by start time
+def get_user_week(username, week_dates):
+    user_schedule = Schedule.query.filter_by(username=username).filter(
+        Schedule.in_range(week_dates[0], week_dates[-1])).order_by(Schedule.date, Schedule.start_time).all()
+    date_to_shifts = {}
+    for shift in user_schedule:
+        date_to_shifts.setdefault(shift.date, []).append(shift)
+    return date_to_shifts
+
+
+# Usernames of employees who are left out of schedule generation
+def get_inactive_employees():
+    rows = db.session.query(User.username).filter(User.role != 'admin', User.active.is_(False)).all()
+    return {username for username, in rows}
@@ -0,0 +1,121 @@
+import datetime
+from sqlalchemy import func
+from classes.user import User, db
+from classes.availability import TimeOff
+from classes.employee_week_stats import EmployeeWeekStats
+from core.changes import week_start
+
+REPORT_GROUPS = ('employee', 'week')
+
+
+def full_weeks(start, end):
+    """
+    Split an inclusive date range into whole weeks and the days around them
+
+    Returns:
+        tuple: (first Monday, last Monday) of the whole weeks or None, and a list of
+        (start, end) day ranges before and after them that only cover part of a week
+    """
+    first = week_start(start) if start.weekday() == 0 else week_start(start) + datetime.timedelta(weeks=1)
+    last = week_start(end) if end.weekday() == 6 else week_start(end) - datetime.timedelta(weeks=1)
+    if first > last:
+        return None, [(start, end)]
+    partial = []
+    if start < first:
+        partial.append((start, first - datetime.timedelta(days=1)))
+    if last + datetime.timedelta(days=6) < end:
+        partial.append((last + datetime.timedelta(days=7), end))
+    return (first, last), partial
+
+
+def labor_totals(start, end, group='employee'):
+    """
+    Shifts, hours and labor cost in an inclusive date range
+
+    Whole weeks are summed from the employee_week_stats rollup; only the days of a
+    first or last week the range covers in part are read from the schedules, so
+    the work does not grow with the number of shifts in the range.
+
+    Args:
+        start (datetime.date): First day, inclusive
+        end (datetime.date): Last day, inclusive
+        group (str): 'employee' for one total per username, 'week' for one per Monday
+
+    Returns:
+        dict: {username or week Monday: [shifts, hours, labor_cost]}
+    """
+    if group not in REPORT_GROUPS:
+        raise ValueError(f"group must be one of {', '.join(REPORT_GROUPS)}")
+    weeks, partial = full_weeks(start, end)
+    column = EmployeeWeekStats.username if group == 'employee' else EmployeeWeekStats.week_start
+
+    totals = {}
+    if weeks:
+        rows = db.session.query(column, func.sum(EmployeeWeekStats.shifts), func.sum(EmployeeWeekStats.hours),
+                                func.sum(EmployeeWeekStats.labor_cost)).filter(
+            EmployeeWeekStats.week_start.between(*weeks)).group_by(column)
+        totals = {key: [shifts, hours, cost] for key, shifts, hours, cost in rows}
+    def group_key(username, day):
+        return username if group == 'employee' else week_start(day)
+
+    for first_day, last_day in partial:
+        edge = EmployeeWeekStats.totals(EmployeeWeekStats.shift_rows(first_day, last_day), group_key)
+        for key, values in edge.items():
+            total = totals.setdefault(key, [0, 0.0, 0.0])
+            for i, value in enumerate(values):
+                total[i] += value
+    return totals
+
+
+def payroll_report(start, end):
+    """
+    Per-employee hours, labor cost and time off for an inclusive date range
+
+    Every employee is listed, with zero hours if they had no shifts. Time off
+    counts approved requests that start in the range; the balances are the
+    employee's current PTO and sick hours.
+
+    Returns:
+        list: One dict per employee, ordered by last and first name
+    """
+    totals = labor_totals(start, end, 'employee')
+    time_off = {}
+    for username, kind, hours in db.session.query(TimeOff.username, TimeOff.kind, func.sum(TimeOff.hours)).filter(
+            TimeOff.status == 'approved', TimeOff.start_date.between(start, end)).group_by(
+            TimeOff.username, TimeOff.kind):
+        time_off.setdefault(username, {})[kind] = hours
+
+    report = []
+    employees = User.query.filter(User.role != 'admin').order_by(User.last_name, User.first_name, User.username)
+    for employee in employees:
+        shifts, hours, cost = totals.get(employee.username, (0, 0.0, 0.0))
+        taken = time_off.get(employee.username, {})
+        report.append({
+            'username': employee.username,
+            'first_name': employee.first_name,
+            'last_name': employee.last_name,
+            'job_assignment': employee.job_assignment,
+            'location': employee.location,
+            'hourly_rate': employee.hourly_rate,
+            'shifts': shifts,
+            'hours': round(hours, 2),
+            'labor_cost': round(cost, 2),
+            'pto_taken': taken.get('pto', 0),
+            'sick_taken': taken.get('sick', 0),
+            'unpaid_taken': taken.get('unpaid', 0),
+            'pto_balance': employee.pto_hours or 0,
+            'sick_balance': employee.sick_hours or 0,
+        })
+    return report
+
+
+def weekly_labor_report(start, end):
+    """Shifts, hours and labor cost for every week overlapping an inclusive date range, oldest first"""
+    totals = labor_totals(start, end, 'week')
+    report = []
+    week = week_start(start)
+    while week <= end:
+        shifts, hours, cost = totals.get(week, (0, 0.0, 0.0))
+        report.append({'week_start': week, 'shifts': shifts, 'hours': round(hours, 2), 'labor_cost': round(cost, 2)})
+        week += datetime.timedelta(weeks=1)
+    return report
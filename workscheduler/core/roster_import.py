@@ -0,0 +1,120 @@
+import csv
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from classes.user import User, db
+from core.changes import employees_changed
+from core.metrics import span
+
+REQUIRED_COLUMNS = ('username', 'password', 'first_name', 'last_name')
+OPTIONAL_COLUMNS = ('email', 'phone', 'address', 'hire_date', 'job_assignment', 'location', 'hourly_rate',
+                    'sick_hours', 'pto_hours', 'active')
+NUMERIC_COLUMNS = ('hourly_rate', 'sick_hours', 'pto_hours')
+
+# Usernames checked against the users table per query, SQLite limits bound parameters
+LOOKUP_BATCH_SIZE = 500
+# Errors reported back before giving up on listing them all
+MAX_REPORTED_ERRORS = 50
+
+
+# A roster file that was rejected; nothing was imported
+class RosterImportError(ValueError):
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} problem(s) found, no employees were imported.')
+        self.errors = errors
+
+
+def _parse_row(line, row, seen):
+    """Validate one CSV row and return (User column dict, list of error messages)"""
+    errors = []
+    values = {column: (row.get(column) or '').strip() for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+    for column in REQUIRED_COLUMNS:
+        if not values[column]:
+            errors.append(f'Line {line}: {column} is required.')
+    username = values['username']
+    if username in seen:
+        errors.append(f'Line {line}: username {username} also appears on line {seen[username]}.')
+    elif username:
+        seen[username] = line
+    if len(username) > 80:
+        errors.append(f'Line {line}: username is longer than 80 characters.')
+
+    user = {column: values[column] or None for column in ('username', 'first_name', 'last_name', 'email',
+                                                          'phone', 'address', 'job_assignment', 'location')}
+    for column in NUMERIC_COLUMNS:
+        try:
+            user[column] = float(values[column]) if values[column] else (None if column == 'hourly_rate' else 0)
+        except ValueError:
+            errors.append(f'Line {line}: {column} must be a number.')
+            continue
+        if user[column] is not None and user[column] < 0:
+            errors.append(f'Line {line}: {column} cannot be negative.')
+    if values['hire_date']:
+        try:
+            datetime.date.fromisoformat(values['hire_date'])
+        except ValueError:
+            errors.append(f'Line {line}: hire_date must be YYYY-MM-DD.')
+    user['hire_date'] = values['hire_date'] or None
+    user['active'] = values['active'].lower() not in ('0', 'false', 'no', 'n')
+    user['role'] = 'employee'
+    user['password'] = values['password']
+    return user, errors
+
+
+def import_employees(lines, max_rows=10000, hash_workers=None):
+    """
+    Validate a roster CSV and insert every employee in one transaction
+
+    The header row names the columns: username, password, first_name and
+    last_name are required, email, phone, address, hire_date, job_assignment,
+    location, hourly_rate, sick_hours, pto_hours and active are optional. Password
+    hashing dominates the cost of a large import, so it runs in a thread pool
+    (hashlib releases the GIL while hashing).
+
+    Args:
+        lines (iterable): Text lines of the CSV file, e.g. an io.TextIOWrapper around the upload
+        max_rows (int): Largest number of employees accepted in one file
+        hash_workers (int, optional): Threads hashing passwords, None for the executor default
+
+    Returns:
+        int: Number of employees imported
+
+    Raises:
+        RosterImportError: If any row is invalid or the file is too large; nothing is inserted
+    """
+    reader = csv.DictReader(lines)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise RosterImportError([f"Missing column(s): {', '.join(missing)}."])
+
+    users, errors, seen = [], [], {}
+    for line, row in enumerate(reader, start=2):
+        if len(users) >= max_rows:
+            raise RosterImportError([f'At most {max_rows} employees can be imported at once.'])
+        user, row_errors = _parse_row(line, row, seen)
+        users.append(user)
+        errors += row_errors
+    if not users:
+        raise RosterImportError(['The file has no employees.'])
+
+    usernames = list(seen)
+    for i in range(0, len(usernames), LOOKUP_BATCH_SIZE):
+        existing = db.session.query(User.username).filter(User.username.in_(usernames[i:i + LOOKUP_BATCH_SIZE]))
+        errors += [f'Line {seen[username]}: username {username} already exists.' for username, in existing]
+    if errors:
+        raise RosterImportError(errors[:MAX_REPORTED_ERRORS])
+
+    with span('roster_password_hashing'), ThreadPoolExecutor(max_workers=hash_workers) as pool:
+        hashes = pool.map(generate_password_hash, [user.pop('password') for user in users])
+        for user, password_hash in zip(users, hashes):
+            user['password_hash'] = password_hash
+
+    try:
+        db.session.execute(insert(User), users)
+        employees_changed()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(users)
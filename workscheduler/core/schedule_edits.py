@@ -0,0 +1,196 @@
+import datetime
+from classes.user import User, db
+from classes.schedule import Schedule
+from core.changes import schedules_changed
+from core.utils import parse_time
+
+# Largest number of operations accepted in one batch
+MAX_EDIT_BATCH = 500
+
+EDIT_OPERATIONS = ('reassign', 'update', 'delete')
+
+
+# A batch that cannot be applied; index points at the operation at fault, if any
+class ScheduleEditError(ValueError):
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.index = index
+
+
+# A batch that is malformed, as opposed to one that conflicts with the schedule
+class InvalidScheduleEdit(ScheduleEditError):
+    pass
+
+
+def shift_to_dict(shift):
+    return {'id': shift.id, 'username': shift.username, 'date': shift.date.isoformat(),
+            'start_time': shift.start_time.strftime('%H:%M'), 'end_time': shift.end_time.strftime('%H:%M')}
+
+
+def _read_date(value, index):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidScheduleEdit('Expected date as YYYY-MM-DD', index)
+
+
+def _read_time(value, index):
+    try:
+        return parse_time(value)
+    except (TypeError, ValueError):
+        raise InvalidScheduleEdit('Expected times as HH:MM', index)
+
+
+def _read_operation(operation, index):
+    """
+    Check the fields of one operation and convert them
+
+    Returns:
+        dict: op, shift_id (int), and username (str) and date (datetime.date or None)
+        for reassign or start_time and end_time (datetime.time) for update
+
+    Raises:
+        InvalidScheduleEdit: If a field is missing or has the wrong type
+    """
+    if not isinstance(operation, dict) or operation.get('op') not in EDIT_OPERATIONS:
+        raise InvalidScheduleEdit(f"op must be one of {', '.join(EDIT_OPERATIONS)}", index)
+    shift_id = operation.get('shift_id')
+    if not isinstance(shift_id, int) or isinstance(shift_id, bool):
+        raise InvalidScheduleEdit('Expected a numeric shift_id', index)
+    checked = {'op': operation['op'], 'shift_id': shift_id}
+    if operation['op'] == 'reassign':
+        if not isinstance(operation.get('username'), str):
+            raise InvalidScheduleEdit('Expected username as a string', index)
+        checked['username'] = operation['username']
+        checked['date'] = _read_date(operation['date'], index) if operation.get('date') else None
+    elif operation['op'] == 'update':
+        checked['start_time'] = _read_time(operation.get('start_time'), index)
+        checked['end_time'] = _read_time(operation.get('end_time'), index)
+        # Equal times would be stored as a 24 hour shift, templates and availability reject them too
+        if checked['start_time'] == checked['end_time']:
+            raise InvalidScheduleEdit('Start and end time cannot be the same', index)
+    return checked
+
+
+def check_employee_shifts(username, shifts, max_shifts_per_employee, max_shifts_per_day, min_rest_hours):
+    """
+    Check one employee's shifts against the same limits schedule generation uses
+
+    Args:
+        username (str): Employee the shifts belong to, used in messages
+        shifts (list): Schedule rows covering at least 6 days either side of every edited date
+        max_shifts_per_employee (int): Shifts allowed in any 7 consecutive days
+        max_shifts_per_day (int): Shifts allowed on one day
+        min_rest_hours (float): Rest required between the end of one shift and the start of the next
+
+    Returns:
+        str: Description of the first violation, or None if the shifts are valid
+    """
+    shifts = sorted(shifts, key=lambda shift: shift.start_at)
+    min_rest = datetime.timedelta(hours=min_rest_hours)
+    for previous, shift in zip(shifts, shifts[1:]):
+        if shift.start_at < previous.end_at:
+            return f'{username} would be double-booked on {shift.date.isoformat()}.'
+        # Split shifts on the same day are limited by max_shifts_per_day, not the rest period
+        if previous.date != shift.date and shift.start_at - previous.end_at < min_rest:
+            return f'{username} would get less than {min_rest_hours:g} hours rest before {shift.date.isoformat()}.'
+
+    per_day = {}
+    for shift in shifts:
+        per_day[shift.date] = per_day.get(shift.date, 0) + 1
+    for day, count in sorted(per_day.items()):
+        if count > max_shifts_per_day:
+            return f'{username} would work {count} shifts on {day.isoformat()} (at most {max_shifts_per_day}).'
+        window_end = day + datetime.timedelta(days=6)
+        in_window = sum(n for other, n in per_day.items() if day <= other <= window_end)
+        if in_window > max_shifts_per_employee:
+            return (f'{username} would work {in_window} shifts between {day.isoformat()} and '
+                    f'{window_end.isoformat()} (at most {max_shifts_per_employee}).')
+    return None
+
+
+def apply_schedule_edits(operations, max_shifts_per_employee=5, max_shifts_per_day=1, min_rest_hours=0):
+    """
+    Apply a batch of shift edits in one transaction, or none of them
+
+    Each operation is a dict with an "op" and the "shift_id" it applies to:
+    reassign takes "username" and optionally a new "date", update takes
+    "start_time" and "end_time", delete takes nothing else. Operations are
+    applied in order, then every employee who gained or changed a shift is validated.
+
+    Args:
+        operations (list): Operation dicts as sent by schedule.js
+        max_shifts_per_employee (int): Shifts allowed in any 7 consecutive days
+        max_shifts_per_day (int): Shifts allowed per employee on one day
+        min_rest_hours (float): Rest required between shifts on different days
+
+    Returns:
+        tuple: (changed shifts as dicts, ids of deleted shifts)
+
+    Raises:
+        InvalidScheduleEdit: If an operation is malformed, before anything is read or written
+        ScheduleEditError: If a shift or employee does not exist or the result breaks a limit;
+        the session is rolled back
+    """
+    if not isinstance(operations, list) or not operations:
+        raise InvalidScheduleEdit('Expected a non-empty list of operations')
+    if len(operations) > MAX_EDIT_BATCH:
+        raise InvalidScheduleEdit(f'At most {MAX_EDIT_BATCH} operations per batch')
+    operations = [_read_operation(operation, index) for index, operation in enumerate(operations)]
+
+    try:
+        shift_ids = {operation['shift_id'] for operation in operations}
+        shifts = {shift.id: shift for shift in Schedule.query.filter(Schedule.id.in_(shift_ids))}
+
+        usernames = {operation['username'] for operation in operations if operation['op'] == 'reassign'}
+        employees = {username for username, in db.session.query(User.username).filter(
+            User.username.in_(usernames), User.role != 'admin')}
+
+        # (username, date) of every shift before and after its edits, and where the edited shifts ended up
+        touched = set()
+        placed = set()
+        deleted = set()
+        for index, operation in enumerate(operations):
+            shift = shifts.get(operation['shift_id'])
+            if shift is None or shift.id in deleted:
+                raise ScheduleEditError(f"Shift {operation['shift_id']} not found", index)
+            touched.add((shift.username, shift.date))
+            if operation['op'] == 'reassign':
+                if operation['username'] not in employees:
+                    raise ScheduleEditError(f"Employee {operation['username']} not found", index)
+                shift.username = operation['username']
+                if operation['date']:
+                    shift.date = operation['date']
+            elif operation['op'] == 'update':
+                shift.start_time = operation['start_time']
+                shift.end_time = operation['end_time']
+            else:
+                db.session.delete(shift)
+                deleted.add(shift.id)
+            touched.add((shift.username, shift.date))
+        db.session.flush()
+
+        # Only days that gained or changed a shift can break a limit, deletes only free up room
+        for shift_id, shift in shifts.items():
+            if shift_id not in deleted:
+                placed.add((shift.username, shift.date))
+        by_employee = {}
+        for username, day in placed:
+            by_employee.setdefault(username, []).append(day)
+        for username, days in sorted(by_employee.items()):
+            # A 7-day window or an overnight shift reaches at most 6 days past an edited date
+            start = min(days) - datetime.timedelta(days=6)
+            end = max(days) + datetime.timedelta(days=6)
+            nearby = Schedule.query.filter(Schedule.username == username, Schedule.in_range(start, end)).all()
+            problem = check_employee_shifts(username, nearby, max_shifts_per_employee, max_shifts_per_day,
+                                            min_rest_hours)
+            if problem:
+                raise ScheduleEditError(problem)
+
+        changed = [shift_to_dict(shift) for shift_id, shift in sorted(shifts.items()) if shift_id not in deleted]
+        schedules_changed([day for _, day in touched], [username for username, _ in touched], changed, sorted(deleted))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return changed, sorted(deleted)
@@ -0,0 +1,423 @@
+import datetime
+from ortools.sat.python import cp_model
+from core.utils import DAY_MINUTES
+from core.solver import configure_solver
+
+# Most assumptions the diagnosis tries to drop from an infeasible core, one extra solve each
+MAX_CORE_SHRINK = 12
+# Time limit of each of those solves; one that runs out keeps its assumption in the core
+CORE_SHRINK_SECONDS = 2.0
+
+
+# Work out once per solve which templates one employee cannot combine
+def shift_conflicts(templates, min_rest_hours=0):
+    """
+    Find the template combinations a single employee cannot work
+
+    Args:
+        templates (list): ShiftTemplate rows, in model order
+        min_rest_hours (float): Minimum hours between the end of one shift and the start of the next
+
+    Returns:
+        tuple: (same_day, next_day). same_day is a list of template index groups of which at
+            most one can be worked on a day: the maximal sets of overlapping templates plus
+            back-to-back pairs with too little rest. next_day is a list of (s1, s2) pairs where
+            s1 on one day and s2 on the following day overlap or leave too little rest.
+    """
+    min_rest = min_rest_hours * 60
+    # Overlapping intervals form cliques; the maximal ones are the sets running at some template's start
+    running = {frozenset(t for t, other in enumerate(templates)
+                         if other.start_minutes <= template.start_minutes < other.end_minutes)
+               for template in templates}
+    same_day = [sorted(group) for group in running
+                if len(group) > 1 and not any(group < other for other in running)]
+    same_day += [[s1, s2] for s1, first in enumerate(templates) for s2, second in enumerate(templates)
+                 if s1 != s2 and 0 <= second.start_minutes - first.end_minutes < min_rest]
+    # A negative gap means an overnight template runs into the next day's shift
+    next_day = [(s1, s2) for s1, first in enumerate(templates) for s2, second in enumerate(templates)
+                if DAY_MINUTES + second.start_minutes - first.end_minutes < min_rest]
+    return sorted(same_day), next_day
+
+
+# Spread between the largest and smallest group total, e.g. shifts per employee
+def add_spread(model, groups, name):
+    """
+    Add an integer variable bounded below by max(total) - min(total) over the groups
+
+    Args:
+        model (CpModel): Model to add to
+        groups (list): Lists of Boolean variables; empty groups (nobody can work) are skipped
+        name (str): Prefix for the new variable names
+
+    Returns:
+        IntVar: Minimizing it pulls the totals together
+    """
+    groups = [group for group in groups if group]
+    upper = max((len(group) for group in groups), default=0)
+    most = model.NewIntVar(0, upper, f'{name}_max')
+    fewest = model.NewIntVar(0, upper, f'{name}_min')
+    for group in groups:
+        total = cp_model.LinearExpr.Sum(group)
+        model.Add(total <= most)
+        model.Add(total >= fewest)
+    spread = model.NewIntVar(0, upper, f'{name}_spread')
+    model.Add(spread == most - fewest)
+    return spread
+
+
+# Everything one solve needs, loaded once so the model can be built more than once
+class ScheduleProblem:
+    def __init__(self, employees, templates, range_dates, demand, candidates, max_shifts_per_employee=5,
+                 max_shifts_per_day=1, min_rest_hours=0, outside_shifts=None):
+        """
+        Args:
+            employees (list): User rows, indexed as e
+            templates (list): ShiftTemplate rows, indexed as s
+            range_dates (list): Consecutive dates, indexed as d
+            demand (list): demand[d][s] is the number of employees needed
+            candidates (list): (e, d, s) triples the employee is available for
+            max_shifts_per_employee (int): Maximum shifts per employee in any rolling 7 days
+            max_shifts_per_day (int): Shifts one employee may work on a day
+            min_rest_hours (float): Minimum hours between the end of one shift and the start of the next
+            outside_shifts (dict, optional): {(e, day offset): [Schedule]} already scheduled
+                within six days of the range, e.g. offset -1 is the day before it
+        """
+        self.employees = employees
+        self.templates = templates
+        self.range_dates = range_dates
+        self.demand = demand
+        self.candidates = candidates
+        self.max_shifts_per_employee = max_shifts_per_employee
+        self.max_shifts_per_day = max_shifts_per_day
+        self.min_rest_hours = min_rest_hours
+        self.outside_shifts = outside_shifts or {}
+
+    @property
+    def num_days(self):
+        return len(self.range_dates)
+
+    def fingerprint(self):
+        """Everything that shapes the model, as JSON-serializable data for SolutionCache keys"""
+        return {
+            'employees': [[employee.username, employee.hourly_rate] for employee in self.employees],
+            'templates': [[template.id, template.start_time.isoformat(), template.end_time.isoformat()]
+                          for template in self.templates],
+            'first_day': self.range_dates[0].isoformat(),
+            'num_days': self.num_days,
+            'demand': self.demand,
+            'candidates': self.candidates,
+            'limits': [self.max_shifts_per_employee, self.max_shifts_per_day, self.min_rest_hours],
+            'outside_shifts': sorted([e, offset, shift.start_time.isoformat(), shift.end_time.isoformat()]
+                                     for (e, offset), shifts in self.outside_shifts.items() for shift in shifts),
+        }
+
+    def partitions(self):
+        """
+        Split into independent problems that share no employee and no template
+
+        An employee and a template are linked when the employee can work the template on some
+        day (job assignment, location, availability). Linked groups never constrain each
+        other, so each can be solved on its own and the solutions combined. Employees who can
+        work nothing are left out; templates nobody can work keep a group of their own so
+        their demand is still checked.
+
+        Returns:
+            list: (ScheduleProblem, employee indices, template indices) per group, most variables first
+        """
+        num_employees = len(self.employees)
+        parent = list(range(num_employees + len(self.templates)))
+
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        # Union-find over employees (0..E-1) and templates (E..E+S-1)
+        for e, d, s in self.candidates:
+            root_e, root_s = find(e), find(num_employees + s)
+            if root_e != root_s:
+                parent[root_e] = root_s
+
+        groups = {}
+        for s in range(len(self.templates)):
+            groups.setdefault(find(num_employees + s), ([], []))[1].append(s)
+        for e in range(num_employees):
+            group = groups.get(find(e))
+            if group is not None:
+                group[0].append(e)
+        candidates = {}
+        for e, d, s in self.candidates:
+            candidates.setdefault(find(e), []).append((e, d, s))
+
+        partitions = []
+        for root, (employee_ids, template_ids) in groups.items():
+            employee_map = {e: i for i, e in enumerate(employee_ids)}
+            template_map = {s: i for i, s in enumerate(template_ids)}
+            partitions.append((ScheduleProblem(
+                [self.employees[e] for e in employee_ids],
+                [self.templates[s] for s in template_ids],
+                self.range_dates,
+                [[row[s] for s in template_ids] for row in self.demand],
+                [(employee_map[e], d, template_map[s]) for e, d, s in candidates.get(root, ())],
+                max_shifts_per_employee=self.max_shifts_per_employee,
+                max_shifts_per_day=self.max_shifts_per_day,
+                min_rest_hours=self.min_rest_hours,
+                outside_shifts={(employee_map[e], offset): shifts
+                                for (e, offset), shifts in self.outside_shifts.items() if e in employee_map},
+            ), employee_ids, template_ids))
+        partitions.sort(key=lambda partition: (-len(partition[0].candidates), partition[2]))
+        return partitions
+
+    @property
+    def total_demand(self):
+        return sum(sum(row) for row in self.demand)
+
+    def capacity_shortfalls(self):
+        """
+        Cheap check for demand no roster of this size could ever cover, before building a model.
+        Looks at totals only (days x templates), so an empty result does not prove feasibility.
+
+        Returns:
+            list: Human readable problems, empty if none were found
+        """
+        num_employees = len(self.employees)
+        per_day = num_employees * self.max_shifts_per_day
+        problems = []
+        daily_totals = []
+        for d, day in enumerate(self.range_dates):
+            for s, template in enumerate(self.templates):
+                if self.demand[d][s] > num_employees:
+                    problems.append(f'{day:%A %b %d} needs {self.demand[d][s]} on {template.name} '
+                                    f'but only {num_employees} active employee(s) can work it.')
+            daily_totals.append(sum(self.demand[d]))
+            if daily_totals[-1] > per_day:
+                problems.append(f'{day:%A %b %d} needs {daily_totals[-1]} shifts but {num_employees} employees '
+                                f'can work at most {per_day} a day.')
+
+        # Every 7 consecutive days, with a running total
+        per_week = num_employees * self.max_shifts_per_employee
+        window = sum(daily_totals[:7])
+        for first in range(0, self.num_days - 6):
+            if first:
+                window += daily_totals[first + 6] - daily_totals[first - 1]
+            if window > per_week:
+                problems.append(f'The 7 days from {self.range_dates[first]:%A %b %d} need {window} shifts but '
+                                f'{num_employees} employees can work at most {per_week} '
+                                f'({self.max_shifts_per_employee} each).')
+                break
+        return problems
+
+
+# CP-SAT model for a ScheduleProblem.
+# With diagnose=True every demand, employee limit and the rest rule get an assumption
+# literal, so an infeasible solve can report which of them conflict.
+class ScheduleModel:
+    def __init__(self, problem, diagnose=False):
+        self.problem = problem
+        self.diagnose = diagnose
+        self.model = cp_model.CpModel()
+        self.assumptions = {}  # literal index -> ('demand', d, s) | ('max_shifts', e) | ('rest',)
+        self._build()
+
+    def _assumption(self, reason):
+        # Enforcement literal for a group of constraints, None when not diagnosing
+        if not self.diagnose:
+            return None
+        literal = self.model.NewBoolVar(f'assume_{len(self.assumptions)}')
+        self.assumptions[literal.Index()] = reason
+        self.model.AddAssumption(literal)
+        return literal
+
+    def _add(self, constraint, literal):
+        if literal is not None:
+            constraint.OnlyEnforceIf(literal)
+        return constraint
+
+    def _build(self):
+        problem, model = self.problem, self.model
+        num_employees, num_days, num_shifts = len(problem.employees), problem.num_days, len(problem.templates)
+
+        # Variables: shifts[(e, d, s)] is True if employee 'e' works on day 'd' template 's'.
+        # Only triples the employee is available for get a variable.
+        self.shifts = {}
+        self.by_day_shift = [[[] for _ in range(num_shifts)] for _ in range(num_days)]
+        # by_employee_day[e][d] maps template index -> variable
+        self.by_employee_day = [[{} for _ in range(num_days)] for _ in range(num_employees)]
+        for e, d, s in problem.candidates:
+            var = model.NewBoolVar(f'shift_e{e}_d{d}_s{s}')
+            self.shifts[(e, d, s)] = var
+            self.by_day_shift[d][s].append(var)
+            self.by_employee_day[e][d][s] = var
+
+        # Constraints are added from prebuilt variable lists with the batched CP-SAT helpers,
+        # so build time grows linearly with employees x days x templates.
+        # 1. Required number of employees per template per day
+        for d in range(num_days):
+            for s in range(num_shifts):
+                required = problem.demand[d][s]
+                literal = self._assumption(('demand', d, s))
+                if required == 1 and literal is None:
+                    model.AddExactlyOne(self.by_day_shift[d][s])
+                else:
+                    self._add(model.Add(cp_model.LinearExpr.Sum(self.by_day_shift[d][s]) == required), literal)
+
+        # 2. One shift at a time: at most max_shifts_per_day a day, never two that overlap or
+        # leave too little rest, including overnight shifts running into the next day
+        same_day, next_day = shift_conflicts(problem.templates, problem.min_rest_hours)
+        rest = self._assumption(('rest',)) if next_day or problem.min_rest_hours else None
+        for e in range(num_employees):
+            for d in range(num_days):
+                day_vars = self.by_employee_day[e][d]
+                if problem.max_shifts_per_day == 1:
+                    if len(day_vars) > 1:
+                        model.AddAtMostOne(list(day_vars.values()))
+                else:
+                    for group in same_day:
+                        group_vars = [day_vars[s] for s in group if s in day_vars]
+                        if len(group_vars) > 1:
+                            model.AddAtMostOne(group_vars)
+                    if len(day_vars) > problem.max_shifts_per_day:
+                        model.Add(cp_model.LinearExpr.Sum(list(day_vars.values())) <= problem.max_shifts_per_day)
+                if d + 1 < num_days:
+                    next_vars = self.by_employee_day[e][d + 1]
+                    for s1, s2 in next_day:
+                        if s1 in day_vars and s2 in next_vars:
+                            if rest is None:
+                                model.AddAtMostOne([day_vars[s1], next_vars[s2]])
+                            else:
+                                model.AddBoolOr([day_vars[s1].Not(), next_vars[s2].Not()]).OnlyEnforceIf(rest)
+
+        # 3. Each employee can work at most max_shifts_per_employee shifts in any 7 consecutive days,
+        # which also covers every calendar week in the range
+        for e in range(num_employees):
+            literal = self._assumption(('max_shifts', e))
+            for first in range(-6, num_days):
+                window = range(first, first + 7)
+                already_worked = sum(len(problem.outside_shifts.get((e, d), ())) for d in window)
+                worked = [var for d in window if 0 <= d < num_days for var in self.by_employee_day[e][d].values()]
+                limit = max(0, problem.max_shifts_per_employee - already_worked)
+                if len(worked) > limit:
+                    self._add(model.Add(cp_model.LinearExpr.Sum(worked) <= limit), literal)
+
+        # 4. Rest and overlap across the range boundaries, against shifts already scheduled outside it
+        min_rest = datetime.timedelta(hours=problem.min_rest_hours)
+        first_day, last_day = problem.range_dates[0], problem.range_dates[-1]
+        for e in range(num_employees):
+            for previous in problem.outside_shifts.get((e, -1), ()):
+                for s, var in self.by_employee_day[e][0].items():
+                    start_at = datetime.datetime.combine(first_day, problem.templates[s].start_time)
+                    if start_at - previous.end_at < min_rest:
+                        self._add(model.Add(var == 0), rest)
+            for following in problem.outside_shifts.get((e, num_days), ()):
+                for s, var in self.by_employee_day[e][num_days - 1].items():
+                    end_at = datetime.datetime.combine(last_day, problem.templates[s].start_time) + \
+                        datetime.timedelta(hours=problem.templates[s].hours)
+                    if following.start_at - end_at < min_rest:
+                        self._add(model.Add(var == 0), rest)
+
+    def shift_cost(self, e, s):
+        """Labor cost in cents of employee e working template s"""
+        return round(self.problem.templates[s].hours * (self.problem.employees[e].hourly_rate or 0) * 100)
+
+    def add_repair_objective(self, existing, dropped=0):
+        """
+        Minimal-change objective: every existing shift dropped and every new shift added costs one
+
+        Args:
+            existing (dict): {(e, d, s): Schedule} current shifts that still have a variable
+            dropped (int): Current shifts that can no longer be kept at all
+        """
+        model = self.model
+        for key, var in self.shifts.items():
+            model.AddHint(var, key in existing)
+        kept = [self.shifts[key] for key in existing]
+        added = [var for key, var in self.shifts.items() if key not in existing]
+        model.Minimize(dropped + len(kept) - cp_model.LinearExpr.Sum(kept) + cp_model.LinearExpr.Sum(added))
+
+    def add_weighted_objective(self, weights):
+        """Minimize weighted labor cost and shift imbalance, see DEFAULT_OBJECTIVE_WEIGHTS"""
+        problem, model = self.problem, self.model
+        num_employees = len(problem.employees)
+        weekend = [d for d, day in enumerate(problem.range_dates) if day.weekday() >= 5]
+        terms = []
+        if weights.get('cost'):
+            keys = list(self.shifts)
+            terms.append(weights['cost'] * cp_model.LinearExpr.WeightedSum(
+                [self.shifts[key] for key in keys], [self.shift_cost(e, s) for e, d, s in keys]))
+        if weights.get('fairness'):
+            worked = [[var for d in range(problem.num_days) for var in self.by_employee_day[e][d].values()]
+                      for e in range(num_employees)]
+            terms.append(weights['fairness'] * 100 * add_spread(model, worked, 'shifts'))
+        if weights.get('weekend') and weekend:
+            worked = [[var for d in weekend for var in self.by_employee_day[e][d].values()]
+                      for e in range(num_employees)]
+            terms.append(weights['weekend'] * 100 * add_spread(model, worked, 'weekend_shifts'))
+        if terms:
+            model.Minimize(cp_model.LinearExpr.Sum(terms))
+
+    def describe(self, reason):
+        """Turn an assumption reason into a sentence for the admin"""
+        problem = self.problem
+        if reason[0] == 'demand':
+            _, d, s = reason
+            day, template = problem.range_dates[d], problem.templates[s]
+            required, available = problem.demand[d][s], len(self.by_day_shift[d][s])
+            message = f'{day:%A %b %d} needs {required} on {template.name}'
+            if available < required:
+                return f'{message} but only {available} employee(s) are available for it.'
+            return f'{message}.'
+        if reason[0] == 'max_shifts':
+            username = problem.employees[reason[1]].username
+            return f'{username} can work at most {problem.max_shifts_per_employee} shifts in any 7 days.'
+        return f'Employees need {problem.min_rest_hours:g} hours of rest between shifts, and shifts cannot overlap.'
+
+
+def _solve_diagnosis(model, settings, job):
+    """Solve one diagnosis model, a cancel of job stops it; returns (status, solver)"""
+    solver = configure_solver(cp_model.CpSolver(), settings)
+    if job is None:
+        return solver.Solve(model), solver
+    job.attach_solver(solver)
+    try:
+        return solver.Solve(model), solver
+    finally:
+        job.attach_solver(None)
+
+
+def explain_infeasibility(problem, solver_settings, job=None):
+    """
+    Find a small set of requirements that cannot all be met together
+
+    Rebuilds the model with assumption literals and solves it on a single worker, which
+    CP-SAT needs to report SufficientAssumptionsForInfeasibility. The core it returns is
+    then shrunk by trying to drop one assumption at a time, each try limited to
+    CORE_SHRINK_SECONDS.
+
+    Args:
+        job (ScheduleJob, optional): A cancel stops the running solve and the diagnosis
+
+    Returns:
+        list: Human readable conflicting requirements, empty if none could be isolated or the job was cancelled
+    """
+    diagnosis = ScheduleModel(problem, diagnose=True)
+    settings = dict(solver_settings, num_workers=1)
+    status, solver = _solve_diagnosis(diagnosis.model, settings, job)
+    if status != cp_model.INFEASIBLE:
+        return []
+    core = list(solver.SufficientAssumptionsForInfeasibility())
+
+    shrink_settings = dict(settings, max_time_seconds=min(settings['max_time_seconds'], CORE_SHRINK_SECONDS))
+    for literal in list(core[:MAX_CORE_SHRINK]):
+        if len(core) == 1:
+            break
+        if job is not None and job.cancel_requested:
+            return []
+        rest = [index for index in core if index != literal]
+        diagnosis.model.ClearAssumptions()
+        diagnosis.model.AddAssumptions([diagnosis.model.GetBoolVarFromProtoIndex(index) for index in rest])
+        if _solve_diagnosis(diagnosis.model, shrink_settings, job)[0] == cp_model.INFEASIBLE:
+            core = rest
+    if job is not None and job.cancel_requested:
+        return []
+    return [diagnosis.describe(diagnosis.assumptions[index]) for index in core]
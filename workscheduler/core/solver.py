@@ -0,0 +1,139 @@
+from flask import current_app
+
+# Per-deployment defaults, overridable through app.config (SOLVER_NUM_WORKERS, ...)
+DEFAULT_SOLVER_SETTINGS = {
+    'num_workers': 0,           # 0 lets CP-SAT use every available core
+    'max_time_seconds': 30.0,   # Wall-clock budget, the best schedule found so far is kept
+    'relative_gap': 0.0,        # Stop early once within this fraction of the best bound
+    'deterministic': False,     # Reproducible results for the same inputs
+    'random_seed': 0,
+}
+
+# In deterministic mode the wall clock may run this many times the deterministic budget
+# before the search stops anyway, so a slow or loaded host cannot hold a job much longer
+DETERMINISTIC_WALL_CLOCK_FACTOR = 3
+
+# Admin form field -> (setting name, type)
+SOLVER_FORM_FIELDS = {
+    'solver_workers': ('num_workers', int),
+    'solver_time_limit': ('max_time_seconds', float),
+    'solver_gap': ('relative_gap', float),
+    'solver_seed': ('random_seed', int),
+}
+
+
+# Objective weights, all in cents so they can be mixed. All zero accepts the first feasible schedule.
+DEFAULT_OBJECTIVE_WEIGHTS = {
+    'cost': 0,       # Per cent of labor cost (shift hours x hourly rate)
+    'fairness': 0,   # Per dollar, charged for each shift between the busiest and least busy employee
+    'weekend': 0,    # Per dollar, charged for each weekend shift between the most and least weekend-heavy
+}
+
+# Admin form field -> objective weight name
+OBJECTIVE_FORM_FIELDS = {
+    'weight_cost': 'cost',
+    'weight_fairness': 'fairness',
+    'weight_weekend': 'weekend',
+}
+
+
+def get_solver_settings(overrides=None):
+    """
+    Combine the deployment defaults with per-request overrides
+
+    Args:
+        overrides (dict, optional): Settings to replace, e.g. from the admin form
+
+    Returns:
+        dict: Validated solver settings
+
+    Raises:
+        ValueError: If a setting is out of range
+    """
+    settings = {}
+    for name, default in DEFAULT_SOLVER_SETTINGS.items():
+        settings[name] = current_app.config.get(f'SOLVER_{name.upper()}', default)
+    for name, value in (overrides or {}).items():
+        if name not in DEFAULT_SOLVER_SETTINGS:
+            raise ValueError(f'Unknown solver setting: {name}')
+        if value is not None:
+            settings[name] = value
+
+    settings['num_workers'] = int(settings['num_workers'])
+    settings['max_time_seconds'] = float(settings['max_time_seconds'])
+    settings['relative_gap'] = float(settings['relative_gap'])
+    settings['random_seed'] = int(settings['random_seed'])
+    settings['deterministic'] = bool(settings['deterministic'])
+
+    if settings['num_workers'] < 0:
+        raise ValueError('Solver workers cannot be negative.')
+    if settings['max_time_seconds'] <= 0:
+        raise ValueError('Solver time limit must be greater than zero.')
+    if not 0 <= settings['relative_gap'] < 1:
+        raise ValueError('Solver gap must be between 0 and 1.')
+    return settings
+
+
+def read_solver_overrides(data):
+    """Pull solver overrides out of a form or JSON body, ignoring blank fields"""
+    overrides = {}
+    for field, (name, cast) in SOLVER_FORM_FIELDS.items():
+        value = data.get(field)
+        if value not in (None, ''):
+            overrides[name] = cast(value)
+    if 'solver_deterministic' in data:
+        overrides['deterministic'] = data.get('solver_deterministic') not in (False, '', '0', 'false', 'off')
+    return overrides
+
+
+def get_objective_weights(overrides=None):
+    """
+    Combine the deployment default weights (app.config OBJECTIVE_COST_WEIGHT, ...) with overrides
+
+    Raises:
+        ValueError: If a weight is unknown or negative
+    """
+    weights = {name: current_app.config.get(f'OBJECTIVE_{name.upper()}_WEIGHT', default)
+               for name, default in DEFAULT_OBJECTIVE_WEIGHTS.items()}
+    for name, value in (overrides or {}).items():
+        if name not in DEFAULT_OBJECTIVE_WEIGHTS:
+            raise ValueError(f'Unknown objective weight: {name}')
+        if value is not None:
+            weights[name] = value
+    for name, value in weights.items():
+        weights[name] = int(value)
+        if weights[name] < 0:
+            raise ValueError('Objective weights cannot be negative.')
+    return weights
+
+
+def read_objective_weights(data):
+    """Pull objective weights out of a form or JSON body, ignoring blank fields"""
+    return {name: int(data.get(field)) for field, name in OBJECTIVE_FORM_FIELDS.items()
+            if data.get(field) not in (None, '')}
+
+
+def objective_gap(objective, best_bound):
+    """Gap between a minimization objective and its bound as a fraction, like CP-SAT's relative_gap_limit"""
+    if objective is None or best_bound is None:
+        return None
+    return abs(objective - best_bound) / max(1.0, abs(objective))
+
+
+def configure_solver(solver, settings):
+    """Apply solver settings to a cp_model.CpSolver"""
+    params = solver.parameters
+    params.num_workers = settings['num_workers']
+    params.random_seed = settings['random_seed']
+    params.relative_gap_limit = settings['relative_gap']
+    if settings['deterministic']:
+        # Wall-clock limits depend on machine load, so bound deterministic
+        # time instead and run the workers in lock-step batches. The wall-clock
+        # cap only cuts in on a host too slow to reach the deterministic limit,
+        # where the result may then differ from run to run.
+        params.max_deterministic_time = settings['max_time_seconds']
+        params.max_time_in_seconds = settings['max_time_seconds'] * DETERMINISTIC_WALL_CLOCK_FACTOR
+        params.interleave_search = True
+    else:
+        params.max_time_in_seconds = settings['max_time_seconds']
+    return solver
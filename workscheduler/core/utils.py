@@ -1,7 +1,8 @@
 import datetime
-from ortools.sat.python import cp_model
-from classes.user import User, db
+from sqlalchemy import insert
+from classes.user import db
 from classes.schedule import Schedule
+from core.changes import schedules_changed
 
 # Function to get the dates for the upcoming week (Monday to Sunday)
 def get_week_dates(start_date=None):
@@ -26,104 +27,81 @@ def get_week_dates(start_date=None):
     week_dates = [start_day + datetime.timedelta(days=i) for i in range(7)]
     return week_dates
 
-# Function to generate shifts using OR-Tools
-def generate_shifts(day_requirements, max_shifts_per_employee=5, active_employees=None, start_date=None):
+# Function to get the dates for several consecutive weeks
+def get_range_dates(start_date=None, num_weeks=1):
     """
-    Generate shifts for a specific week
-    
+    Get list of dates for num_weeks weeks, starting from the same Monday as get_week_dates
+
     Args:
-        day_requirements (dict): Shift requirements for each day
-        max_shifts_per_employee (int): Maximum shifts per employee per week
-        active_employees (list): List of usernames for active employees
-        start_date (str): Start date in 'YYYY-MM-DD' format
+        start_date (str, optional): Start date in 'YYYY-MM-DD' format. If None, uses today's date.
+        num_weeks (int): Number of weeks to include
+
+    Returns:
+        list: List of datetime.date objects, 7 * num_weeks long
     """
-    week_dates = get_week_dates(start_date)
-    
-    # Filter employees based on active_employees parameter
-    if active_employees is not None:
-        employees = User.query.filter(
-            User.role != 'admin',
-            User.username.in_(active_employees)
-        ).all()
-    else:
-        employees = User.query.filter(User.role != 'admin').all()
-    
-    num_employees = len(employees)
-    if num_employees == 0:
-        return False
+    first_day = get_week_dates(start_date)[0]
+    return [first_day + datetime.timedelta(days=i) for i in range(7 * num_weeks)]
 
-    num_days = len(week_dates)
-    days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
 
-    # Define shift types and their times
-    shift_types = {
-        0: ("08:00", "13:00"),  # Opening
-        1: ("12:00", "17:00"),  # Midday
-        2: ("16:00", "22:00")   # Closing
-    }
+# Parse an 'HH:MM' form value into a datetime.time
+def parse_time(value):
+    return datetime.datetime.strptime(value, '%H:%M').time()
 
-    # Create the model
-    model = cp_model.CpModel()
+DAY_MINUTES = 24 * 60
 
-    # Variables: shifts[e][d][s] is True if employee 'e' works on day 'd' shift type 's'
-    shifts = {}
-    for e in range(num_employees):
-        for d in range(num_days):
-            for s in range(3):
-                shifts[(e, d, s)] = model.NewBoolVar(f'shift_e{e}_d{d}_s{s}')
+# Minutes since midnight for a datetime.time
+def minutes_of_day(value):
+    return value.hour * 60 + value.minute
 
-    # Constraints:
-    # 1. Required number of employees per shift type per day
-    for d in range(num_days):
-        day_name = days[d]
-        day_req = day_requirements[day_name]
-        
-        # Opening shifts
-        model.Add(sum(shifts[(e, d, 0)] for e in range(num_employees)) == day_req['opening'])
-        # Midday shifts
-        model.Add(sum(shifts[(e, d, 1)] for e in range(num_employees)) == day_req['midday'])
-        # Closing shifts
-        model.Add(sum(shifts[(e, d, 2)] for e in range(num_employees)) == day_req['closing'])
+# Minutes since midnight at which a shift or availability window ends;
+# one that ends at or before it starts runs past midnight into the next day
+def end_minutes(start_time, end_time):
+    end = minutes_of_day(end_time)
+    return end + DAY_MINUTES if end <= minutes_of_day(start_time) else end
 
-    # 2. Each employee can work at most one shift per day
-    for e in range(num_employees):
-        for d in range(num_days):
-            model.Add(sum(shifts[(e, d, s)] for s in range(3)) <= 1)
+# Match a stored shift to the template with the same times, or else the closest start time
+def closest_template(templates, start_time, end_time=None):
+    for s, template in enumerate(templates):
+        if template.start_time == start_time and template.end_time == end_time:
+            return s
+    start = minutes_of_day(start_time)
+    return min(range(len(templates)), key=lambda s: abs(templates[s].start_minutes - start))
 
-    # 3. Each employee can work at most max_shifts_per_employee shifts per week
-    for e in range(num_employees):
-        model.Add(sum(shifts[(e, d, s)] 
-                     for d in range(num_days) 
-                     for s in range(3)) <= max_shifts_per_employee)
+# SQLite limits the number of bound parameters per statement
+DELETE_BATCH_SIZE = 500
 
-    # Solve the model
-    solver = cp_model.CpSolver()
-    status = solver.Solve(model)
+# Write schedules with set-based statements in a single transaction
+def bulk_write_schedules(new_rows, delete_range=None, delete_ids=None):
+    """
+    Replace schedules without building one ORM object per shift
 
-    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        # Clear existing schedules for the week
-        Schedule.query.filter(Schedule.date.in_([d.strftime('%Y-%m-%d') for d in week_dates])).delete()
+    Args:
+        new_rows (list): Dicts of Schedule column values to insert (executemany)
+        delete_range (tuple, optional): (first date, last date) to clear before inserting
+        delete_ids (list, optional): Schedule ids to delete before inserting
 
-        # Create new schedules
-        for d in range(num_days):
-            for e in range(num_employees):
-                for s in range(3):
-                    if solver.Value(shifts[(e, d, s)]):
-                        start_time, end_time = shift_types[s]
-                        schedule = Schedule(
-                            username=employees[e].username,
-                            date=week_dates[d].strftime('%Y-%m-%d'),
-                            start_time=start_time,
-                            end_time=end_time
-                        )
-                        db.session.add(schedule)
-        
-        db.session.commit()
-        return True
-    return False
+    Every week touched is reported through schedules_changed in the same transaction.
+    """
+    changed_dates = {row['date'] for row in new_rows}
+    if delete_range is not None:
+        Schedule.query.filter(Schedule.in_range(*delete_range)).delete(synchronize_session=False)
+        first_day, last_day = delete_range
+        changed_dates.update(first_day + datetime.timedelta(days=i) for i in range((last_day - first_day).days + 1))
+    delete_ids = list(delete_ids or [])
+    for i in range(0, len(delete_ids), DELETE_BATCH_SIZE):
+        batch = Schedule.query.filter(Schedule.id.in_(delete_ids[i:i + DELETE_BATCH_SIZE]))
+        changed_dates.update(day for day, in batch.with_entities(Schedule.date).distinct())
+        batch.delete(synchronize_session=False)
+    if new_rows:
+        db.session.execute(insert(Schedule), new_rows)
+    schedules_changed(changed_dates)
+    db.session.commit()
 
 # Custom filter to format time in 12-hour format
 def datetimeformat(value):
+    if isinstance(value, datetime.time):
+        return value.strftime('%I:%M %p')
     try:
         # Assuming value is in 'HH:MM' format
         time_obj = datetime.datetime.strptime(value, '%H:%M')
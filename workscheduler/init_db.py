@@ -1,8 +1,36 @@
-from app import db, User
-from app import app
+from flask import Flask
+from classes.user import db, User
+# Import every model so create_all sees all of the tables
+from classes.schedule import Schedule
+from classes.availability import Availability, TimeOff
+from classes.data_version import DataVersion
+from classes.employee_week_stats import EmployeeWeekStats
+from classes.shift_template import ShiftDemand, ShiftTemplate, seed_default_templates
+from classes.solution_cache import SolutionCache
+from core.database import database_config, init_database
+from core.migrations import stamp_schema, upgrade_schema
+
+# Only the database is needed here, so skip loading the routes and the rest of the web app
+app = Flask(__name__)
+app.config.update(database_config())
+init_database(app)
 
 with app.app_context():
+    # Bring an older database up to date before creating any new tables
+    is_new = not db.inspect(db.engine).has_table('users')
+    if not is_new:
+        upgrade_schema(db.engine)
     db.create_all()
+    if is_new:
+        stamp_schema(db.engine)
+
+    # create_all skips tables that already exist, so add any missing indexes to older databases
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+    # Start new databases with the default opening, midday and closing shifts
+    seed_default_templates()
 
     # Create the admin user if it doesn't exist
     if not User.query.filter_by(username='admin').first():
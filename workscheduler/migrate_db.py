@@ -0,0 +1,21 @@
+import sys
+from sqlalchemy import create_engine
+from core.migrations import upgrade_schema
+
+# Upgrade an existing scheduler database to the current schema.
+#   python migrate_db.py                   -> the app's configured database
+#   python migrate_db.py path/to/scheduler.db
+if len(sys.argv) > 1:
+    engine = create_engine(f'sqlite:///{sys.argv[1]}')
+    applied = upgrade_schema(engine)
+else:
+    from flask import Flask
+    from classes.user import db
+    from core.database import database_config, init_database
+    app = Flask(__name__)
+    app.config.update(database_config())
+    init_database(app)
+    with app.app_context():
+        applied = upgrade_schema(db.engine)
+
+print(f'Applied {applied} migration(s).' if applied else 'Database is already up to date.')
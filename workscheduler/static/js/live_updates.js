@@ -0,0 +1,58 @@
+// Live schedule updates: follow the server-sent events stream of the week on screen.
+// handlers.delta(change) gets changed shifts and deleted shift ids, handlers.refresh()
+// is called when the whole week should be fetched again.
+function subscribeWeekUpdates(url, handlers) {
+    if (!window.EventSource || !url) {
+        return null;
+    }
+    const source = new EventSource(url);
+    let reconnecting = false;
+    source.onmessage = ev => {
+        const change = JSON.parse(ev.data);
+        if (change.refresh || !handlers.delta) {
+            handlers.refresh();
+        } else {
+            handlers.delta(change);
+        }
+    };
+    // Streams end every few minutes and on network errors; anything published
+    // while reconnecting was missed, so fetch the week again once the stream is back
+    source.onerror = () => {
+        reconnecting = true;
+    };
+    source.onopen = () => {
+        if (reconnecting) {
+            reconnecting = false;
+            handlers.refresh();
+        }
+    };
+    return source;
+}
+
+// Same output as the datetimeformat template filter, e.g. 08:00 AM
+function formatTime(value) {
+    const [hours, minutes] = value.split(':').map(Number);
+    const hour12 = hours % 12 === 0 ? 12 : hours % 12;
+    return `${String(hour12).padStart(2, '0')}:${String(minutes).padStart(2, '0')} ${hours < 12 ? 'AM' : 'PM'}`;
+}
+
+// Redraw an employee's own week (td[data-date] cells) from /api/schedules
+function reloadMyWeek(table) {
+    const cells = Array.from(table.querySelectorAll('td[data-date]'));
+    if (cells.length === 0) {
+        return;
+    }
+    const start = cells[0].dataset.date;
+    const end = cells[cells.length - 1].dataset.date;
+    fetch(`/api/schedules?start=${start}&end=${end}`)
+    .then(response => response.json())
+    .then(page => {
+        const shiftsByDate = {};
+        page.rows.forEach(([id, username, date, start_time, end_time]) => {
+            (shiftsByDate[date] = shiftsByDate[date] || []).push(`${formatTime(start_time)} - ${formatTime(end_time)}`);
+        });
+        cells.forEach(cell => {
+            cell.textContent = (shiftsByDate[cell.dataset.date] || ['Off']).join(', ');
+        });
+    });
+}
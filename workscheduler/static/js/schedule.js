@@ -18,11 +18,12 @@ document.addEventListener('DOMContentLoaded', function() {
     window.editShift = function(cell) {
         console.log("Edit shift clicked", cell.dataset); // Debug log
 
-        const username = cell.dataset.username;
+        const username = cell.dataset.originalEmployee;
         const date = cell.dataset.date;
         const start = cell.dataset.start;
         const end = cell.dataset.end;
 
+        document.getElementById("shift_id").value = cell.dataset.shiftId;
         document.getElementById("shift_username").value = username;
         document.getElementById("shift_date").value = date;
         document.getElementById("start_time").value = start;
@@ -58,32 +59,239 @@ function dragStart(ev) {
 function dropShift(ev) {
     ev.preventDefault();
     const shiftData = JSON.parse(ev.dataTransfer.getData("text/plain"));
-    const newEmployee = ev.target.closest('td').dataset.employee;
-    const date = ev.target.closest('td').dataset.date;
+    const cell = ev.target.closest('td');
+    const newEmployee = cell.dataset.employee;
+    const date = cell.dataset.date;
 
-    // Don't allow drop if same employee
-    if (shiftData.originalEmployee === newEmployee) {
+    // Don't allow drop on the cell the shift is already in
+    if (shiftData.originalEmployee === newEmployee && shiftData.date === date) {
         return;
     }
 
-    // Send to server
-    fetch('/reassign_shift', {
+    // Move the block now, the server's answer replaces it once the batch is saved
+    const block = document.querySelector(`.shift-block[data-shift-id="${shiftData.shiftId}"]`);
+    if (block) {
+        const oldCell = block.closest('td');
+        block.dataset.originalEmployee = newEmployee;
+        block.dataset.date = date;
+        block.classList.add('pending');
+        setCellBlock(cell, block);
+        refreshEmptyCell(oldCell);
+    }
+    queueEdit({ op: 'reassign', shift_id: Number(shiftData.shiftId), username: newEmployee, date: date });
+}
+
+// Edits waiting to be sent; they go out together shortly after the last change
+const EDIT_FLUSH_DELAY_MS = 800;
+const pendingEdits = [];
+let editFlushTimer = null;
+let editInFlight = false;
+
+function queueEdit(operation) {
+    pendingEdits.push(operation);
+    showEditStatus(`${pendingEdits.length} change(s) waiting to be saved...`);
+    clearTimeout(editFlushTimer);
+    editFlushTimer = setTimeout(flushEdits, EDIT_FLUSH_DELAY_MS);
+}
+
+function flushEdits() {
+    if (editInFlight || pendingEdits.length === 0) {
+        return;
+    }
+    const panel = document.getElementById('scheduleEditStatus');
+    const batch = pendingEdits.splice(0, pendingEdits.length);
+    editInFlight = true;
+    showEditStatus(`Saving ${batch.length} change(s)...`);
+
+    fetch(panel.dataset.batchUrl, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
-        body: JSON.stringify({
-            shift_id: shiftData.shiftId,
-            new_employee: newEmployee,
-            date: date
-        })
-    }).then(response => {
-        if (response.ok) {
-            window.location.reload();
+        body: JSON.stringify({ operations: batch })
+    })
+    .then(response => response.json().then(data => ({ ok: response.ok, data: data })))
+    .then(({ ok, data }) => {
+        if (!ok) {
+            throw new Error(data.message);
+        }
+        data.deleted.forEach(removeShiftBlock);
+        data.shifts.forEach(placeShiftBlock);
+        showEditStatus(`Saved ${batch.length} change(s).`);
+    })
+    .catch(error => {
+        // Nothing in the batch was applied, and later edits were made on top of it
+        pendingEdits.length = 0;
+        showEditStatus(`Changes not saved: ${error.message || 'the server could not be reached'}`, true);
+        reloadWeekShifts();
+    })
+    .finally(() => {
+        editInFlight = false;
+        if (pendingEdits.length > 0) {
+            flushEdits();
+        } else if (refreshAfterSave) {
+            refreshAfterSave = false;
+            reloadWeekShifts();
+        }
+    });
+}
+
+// Warn before leaving the page while edits are still waiting or being saved
+window.addEventListener('beforeunload', ev => {
+    if (pendingEdits.length > 0 || editInFlight) {
+        ev.preventDefault();
+        ev.returnValue = '';
+    }
+});
+
+function showEditStatus(message, isError) {
+    const panel = document.getElementById('scheduleEditStatus');
+    panel.hidden = false;
+    panel.textContent = message;
+    panel.classList.toggle('error', Boolean(isError));
+}
+
+// Queue the time change from the edit form instead of posting it
+function queueShiftUpdate(ev) {
+    const shiftId = document.getElementById("shift_id").value;
+    if (!shiftId) {
+        return true;
+    }
+    ev.preventDefault();
+    const startTime = document.getElementById("start_time").value;
+    const endTime = document.getElementById("end_time").value;
+    const block = document.querySelector(`.shift-block[data-shift-id="${shiftId}"]`);
+    if (block) {
+        block.dataset.start = startTime;
+        block.dataset.end = endTime;
+        block.textContent = `${formatTime(startTime)} - ${formatTime(endTime)}`;
+        block.classList.add('pending');
+    }
+    queueEdit({ op: 'update', shift_id: Number(shiftId), start_time: startTime, end_time: endTime });
+    document.getElementById("editShiftModal").style.display = "none";
+    return false;
+}
+
+function queueShiftDelete() {
+    const shiftId = document.getElementById("shift_id").value;
+    const block = document.querySelector(`.shift-block[data-shift-id="${shiftId}"]`);
+    if (block) {
+        const cell = block.closest('td');
+        block.remove();
+        refreshEmptyCell(cell);
+    }
+    queueEdit({ op: 'delete', shift_id: Number(shiftId) });
+    document.getElementById("editShiftModal").style.display = "none";
+}
+
+function findCell(username, date) {
+    return document.querySelector(
+        `td.shift-cell[data-employee="${CSS.escape(username)}"][data-date="${date}"]`);
+}
+
+function makeShiftBlock(shift) {
+    const block = document.createElement('div');
+    block.className = 'shift-block';
+    block.draggable = true;
+    block.ondragstart = dragStart;
+    block.ondblclick = () => editShift(block);
+    block.dataset.shiftId = shift.id;
+    block.dataset.originalEmployee = shift.username;
+    block.dataset.date = shift.date;
+    block.dataset.start = shift.start_time;
+    block.dataset.end = shift.end_time;
+    block.textContent = `${formatTime(shift.start_time)} - ${formatTime(shift.end_time)}`;
+    return block;
+}
+
+// Put a block in a cell in start time order (split shifts share a cell), dropping the "Off" text
+function setCellBlock(cell, block) {
+    Array.from(cell.childNodes).forEach(node => {
+        if (node.nodeType === Node.TEXT_NODE) {
+            node.remove();
+        }
+    });
+    const later = Array.from(cell.querySelectorAll('.shift-block'))
+        .find(other => other !== block && other.dataset.start > block.dataset.start);
+    cell.insertBefore(block, later || null);
+}
+
+function refreshEmptyCell(cell) {
+    if (cell && !cell.querySelector('.shift-block')) {
+        cell.textContent = 'Off';
+    }
+}
+
+function removeShiftBlock(shiftId) {
+    const block = document.querySelector(`.shift-block[data-shift-id="${shiftId}"]`);
+    if (block) {
+        const cell = block.closest('td');
+        block.remove();
+        refreshEmptyCell(cell);
+    }
+}
+
+// Show a shift where the server has it; shifts moved off this week just disappear
+function placeShiftBlock(shift) {
+    removeShiftBlock(shift.id);
+    const cell = findCell(shift.username, shift.date);
+    if (cell) {
+        setCellBlock(cell, makeShiftBlock(shift));
+    }
+}
+
+// Redraw every cell from /api/schedules after a batch was rejected
+function reloadWeekShifts() {
+    const dates = Array.from(document.querySelectorAll('td.shift-cell'), cell => cell.dataset.date).sort();
+    if (dates.length === 0) {
+        return;
+    }
+    const rows = [];
+    const fetchPage = cursor => {
+        let url = `/api/schedules?start=${dates[0]}&end=${dates[dates.length - 1]}&limit=1000`;
+        if (cursor) {
+            url += `&cursor=${cursor}`;
         }
+        return fetch(url).then(response => response.json()).then(page => {
+            rows.push(...page.rows);
+            return page.next_cursor ? fetchPage(page.next_cursor) : rows;
+        });
+    };
+    fetchPage(null).then(rows => {
+        document.querySelectorAll('td.shift-cell').forEach(cell => { cell.textContent = 'Off'; });
+        rows.forEach(([id, username, date, start_time, end_time]) =>
+            placeShiftBlock({ id, username, date, start_time, end_time }));
     });
 }
 
+// Changes saved by other admins and finished generations arrive over the week's event stream
+let liveUpdates = null;
+let refreshAfterSave = false;
+
+document.addEventListener('DOMContentLoaded', function() {
+    const panel = document.getElementById('scheduleEditStatus');
+    if (panel) {
+        liveUpdates = subscribeWeekUpdates(panel.dataset.streamUrl,
+                                           { delta: applyShiftChanges, refresh: refreshWeekWhenIdle });
+    }
+});
+
+function applyShiftChanges(change) {
+    // Shifts with local edits still waiting keep their local position until the batch is saved
+    const waiting = new Set(pendingEdits.map(operation => operation.shift_id));
+    change.deleted.filter(id => !waiting.has(id)).forEach(removeShiftBlock);
+    change.shifts.filter(shift => !waiting.has(shift.id)).forEach(placeShiftBlock);
+}
+
+// Reload the grid, or once the local edits are saved so they are not drawn over
+function refreshWeekWhenIdle() {
+    if (pendingEdits.length > 0 || editInFlight) {
+        refreshAfterSave = true;
+        return;
+    }
+    reloadWeekShifts();
+}
+
 // Add to schedule.js
 function toggleEmployee(username) {
     const row = document.getElementById(`row-${username}`);
@@ -104,4 +312,47 @@ function toggleEmployee(username) {
             row.classList.toggle('disabled-employee');
         }
     });
-}
\ No newline at end of file
+}
+
+// Poll the background schedule generation job until it finishes
+function pollScheduleJob() {
+    const panel = document.getElementById('scheduleJobStatus');
+    if (!panel) {
+        return;
+    }
+    const text = panel.querySelector('.job-status-text');
+
+    fetch(`/schedule_jobs/${panel.dataset.jobId}`)
+    .then(response => response.json())
+    .then(job => {
+        if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+            // Show the result in place; the grid is redrawn by the event stream, or here without one
+            text.textContent = job.message || `Schedule generation ${job.status}.`;
+            panel.classList.toggle('failed', job.status !== 'completed');
+            panel.querySelector('button').hidden = true;
+            if (!liveUpdates || liveUpdates.readyState !== EventSource.OPEN) {
+                reloadWeekShifts();
+            }
+            return;
+        }
+        let status = `Generating schedules (${job.phase || job.status}, ${job.elapsed}s`;
+        if (job.solutions > 0) {
+            status += `, ${job.solutions} solution(s) found`;
+        }
+        if (job.objective !== null) {
+            status += `, objective ${job.objective}`;
+        }
+        if (job.gap !== null) {
+            status += `, bound ${job.best_bound}, gap ${(job.gap * 100).toFixed(1)}%`;
+        }
+        text.textContent = status + ')...';
+        setTimeout(pollScheduleJob, 1000);
+    });
+}
+
+function cancelScheduleJob() {
+    const panel = document.getElementById('scheduleJobStatus');
+    fetch(`/schedule_jobs/${panel.dataset.jobId}/cancel`, { method: 'POST' });
+}
+
+document.addEventListener('DOMContentLoaded', pollScheduleJob);
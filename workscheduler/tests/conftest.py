@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+# The app imports its packages relative to the workscheduler folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import create_app  # noqa: E402
+from classes.shift_template import seed_default_templates  # noqa: E402
+from classes.user import User, db  # noqa: E402
+from core.migrations import stamp_schema  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Factory for apps on fresh SQLite files with the admin user (password123) and the default shift templates"""
+    def make(name='scheduler.db', **config):
+        app = create_app(dict({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / name}', 'TESTING': True,
+                               'SOLVER_MAX_TIME_SECONDS': 10.0}, **config))
+        with app.app_context():
+            db.create_all()
+            stamp_schema(db.engine)
+            seed_default_templates()
+            admin = User(username='admin', first_name='Admin', last_name='User', role='admin')
+            admin.set_password('password123')
+            db.session.add(admin)
+            db.session.commit()
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def add_employees():
+    """Add employees emp0..emp<count - 1> with the password 'password', call inside an app context"""
+    # Hashing is slow, every employee shares one password hash
+    password_hash = generate_password_hash('password')
+
+    def add(count, **fields):
+        employees = []
+        for i in range(count):
+            employee = User(username=f'emp{i}', first_name='Emp', last_name=str(i), role='employee',
+                            password_hash=password_hash, **dict({'hourly_rate': 15}, **fields))
+            db.session.add(employee)
+            employees.append(employee)
+        db.session.commit()
+        return employees
+    return add
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    return client
@@ -0,0 +1,86 @@
+import datetime
+
+from classes.schedule import Schedule
+from classes.shift_template import DEFAULT_SHIFT_TEMPLATES, ShiftTemplate
+from classes.user import User, db
+from core.generation import generate_shifts
+from core.jobs import ScheduleJob
+from core.schedule_model import ScheduleProblem, explain_infeasibility
+from core.utils import DAYS
+
+WEEK = [datetime.date(2030, 1, 7) + datetime.timedelta(days=i) for i in range(7)]
+SETTINGS = {'num_workers': 1, 'random_seed': 0, 'relative_gap': 0.0, 'deterministic': False,
+            'max_time_seconds': 10.0}
+
+
+def make_problem(num_employees, demand, missing=(), **limits):
+    """A week of the default templates with demand[s] needed every day; missing holds (e, d, s) nobody can work"""
+    employees = [User(username=f'emp{e}') for e in range(num_employees)]
+    templates = [ShiftTemplate(name=name, start_time=start, end_time=end)
+                 for name, start, end in DEFAULT_SHIFT_TEMPLATES]
+    candidates = [(e, d, s) for e in range(num_employees) for d in range(len(WEEK)) for s in range(len(templates))
+                  if (e, d, s) not in missing]
+    return ScheduleProblem(employees, templates, WEEK, [list(demand) for _ in WEEK], candidates, **limits)
+
+
+def test_capacity_check_reports_days_and_weeks_no_roster_could_cover():
+    problem = make_problem(3, [2, 2, 2], max_shifts_per_employee=5)
+    problems = problem.capacity_shortfalls()
+    assert 'Monday Jan 07 needs 6 shifts but 3 employees can work at most 3 a day.' in problems
+    assert problems[-1] == ('The 7 days from Monday Jan 07 need 42 shifts but 3 employees '
+                            'can work at most 15 (5 each).')
+
+
+def test_capacity_check_reports_a_template_needing_more_people_than_the_roster():
+    problem = make_problem(2, [3, 0, 0], max_shifts_per_employee=7)
+    assert problem.capacity_shortfalls()[0] == \
+        'Monday Jan 07 needs 3 on Opening but only 2 active employee(s) can work it.'
+
+
+def test_capacity_check_passes_a_coverable_week():
+    assert make_problem(3, [1, 1, 1], max_shifts_per_employee=7).capacity_shortfalls() == []
+
+
+def test_explanation_is_shrunk_to_the_conflicting_requirement():
+    # Nobody is available for Monday's opening shift, everything else is easy
+    problem = make_problem(3, [1, 0, 0], missing={(e, 0, 0) for e in range(3)}, max_shifts_per_employee=7)
+    assert problem.capacity_shortfalls() == []
+    assert explain_infeasibility(problem, SETTINGS) == \
+        ['Monday Jan 07 needs 1 on Opening but only 0 employee(s) are available for it.']
+
+
+def test_explanation_names_the_rest_rule_when_it_is_part_of_the_conflict():
+    # Closing ends at 22:00, so with 20 hours of rest nobody can work the next day
+    problem = make_problem(3, [1, 1, 1], max_shifts_per_employee=7, min_rest_hours=20)
+    reasons = explain_infeasibility(problem, SETTINGS)
+    assert 'Employees need 20 hours of rest between shifts, and shifts cannot overlap.' in reasons
+    # Far fewer than the 21 demands plus the rest rule that were assumed
+    assert len(reasons) < 10
+
+
+def test_explanation_is_empty_for_a_feasible_problem():
+    problem = make_problem(3, [1, 1, 1], max_shifts_per_employee=7, min_rest_hours=11)
+    assert explain_infeasibility(problem, SETTINGS) == []
+
+
+def test_cancelled_job_stops_the_explanation():
+    problem = make_problem(3, [1, 1, 1], max_shifts_per_employee=7, min_rest_hours=20)
+    job = ScheduleJob()
+    job.cancel()
+    assert explain_infeasibility(problem, SETTINGS, job) == []
+
+
+def test_generation_reports_the_diagnosis_and_keeps_existing_schedules(app, add_employees):
+    with app.app_context():
+        add_employees(3)
+        templates = ShiftTemplate.ordered()
+        existing = Schedule(username='emp0', date=WEEK[0], start_time=datetime.time(8), end_time=datetime.time(13))
+        db.session.add(existing)
+        db.session.commit()
+
+        stats = {}
+        requirements = {day: {template.id: 1 for template in templates} for day in DAYS}
+        assert not generate_shifts(requirements, max_shifts_per_employee=7, start_date=WEEK[0].isoformat(),
+                                   min_rest_hours=20, diagnose=True, stats=stats)
+        assert 'Employees need 20 hours of rest between shifts, and shifts cannot overlap.' in stats['diagnosis']
+        assert [(shift.username, shift.date) for shift in Schedule.query.all()] == [('emp0', WEEK[0])]
@@ -0,0 +1,50 @@
+import datetime
+
+from sqlalchemy import event
+
+from classes.schedule import Schedule
+from classes.user import db
+
+WEEK_START = datetime.date(2030, 1, 7)
+
+
+def seed_roster(app, add_employees, employees):
+    """`employees` employees working every day of the week"""
+    with app.app_context():
+        for employee in add_employees(employees, job_assignment='Cashier', location='Main'):
+            for day in range(7):
+                db.session.add(Schedule(username=employee.username, date=WEEK_START + datetime.timedelta(days=day),
+                                        start_time=datetime.time(9), end_time=datetime.time(17)))
+        db.session.commit()
+    return app
+
+
+def count_view_schedules_queries(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+    with client.session_transaction() as session:
+        session['view_date'] = WEEK_START.isoformat()
+    # The first request fills the per-worker caches, count a steady-state request
+    assert client.get('/view_schedules').status_code == 200
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get('/view_schedules')
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    assert b'emp0' in response.data
+    return len(statements)
+
+
+def test_view_schedules_query_count_does_not_grow_with_roster(make_app, add_employees):
+    small = count_view_schedules_queries(seed_roster(make_app('small.db'), add_employees, 3))
+    large = count_view_schedules_queries(seed_roster(make_app('large.db'), add_employees, 40))
+    assert small == large
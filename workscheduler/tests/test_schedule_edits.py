@@ -0,0 +1,112 @@
+import datetime
+
+import pytest
+
+from classes.schedule import Schedule
+from classes.user import db
+from core.schedule_edits import InvalidScheduleEdit, ScheduleEditError, apply_schedule_edits
+
+MONDAY = datetime.date(2030, 1, 7)
+
+
+@pytest.fixture
+def shifts(app, add_employees):
+    """ids of emp0's 09:00-17:00 shift on Monday and emp1's on Monday and Tuesday"""
+    with app.app_context():
+        add_employees(3)
+        rows = [Schedule(username='emp0', date=MONDAY, start_time=datetime.time(9), end_time=datetime.time(17)),
+                Schedule(username='emp1', date=MONDAY, start_time=datetime.time(9), end_time=datetime.time(17)),
+                Schedule(username='emp1', date=MONDAY + datetime.timedelta(days=1),
+                         start_time=datetime.time(9), end_time=datetime.time(17))]
+        db.session.add_all(rows)
+        db.session.commit()
+        return [row.id for row in rows]
+
+
+def saved(app):
+    with app.app_context():
+        return sorted((shift.id, shift.username, shift.date, shift.start_time, shift.end_time)
+                      for shift in Schedule.query.all())
+
+
+@pytest.mark.parametrize('operation, message', [
+    ({'op': 'move'}, 'op must be one of reassign, update, delete'),
+    ({'op': 'delete', 'shift_id': '1'}, 'Expected a numeric shift_id'),
+    ({'op': 'delete', 'shift_id': True}, 'Expected a numeric shift_id'),
+    ({'op': 'reassign', 'shift_id': 1, 'username': ['emp2']}, 'Expected username as a string'),
+    ({'op': 'reassign', 'shift_id': 1, 'username': 'emp2', 'date': '07/01/2030'}, 'Expected date as YYYY-MM-DD'),
+    ({'op': 'update', 'shift_id': 1, 'start_time': 9, 'end_time': '17:00'}, 'Expected times as HH:MM'),
+    ({'op': 'update', 'shift_id': 1, 'start_time': '09:00', 'end_time': '09:00'},
+     'Start and end time cannot be the same'),
+])
+def test_malformed_operations_are_rejected_before_anything_changes(app, shifts, operation, message):
+    before = saved(app)
+    with app.app_context():
+        with pytest.raises(InvalidScheduleEdit) as exc:
+            apply_schedule_edits([{'op': 'delete', 'shift_id': shifts[0]}, operation])
+    assert str(exc.value) == message
+    assert exc.value.index == 1
+    assert saved(app) == before
+
+
+@pytest.mark.parametrize('operations, limits, message', [
+    # emp1 already works 09:00-17:00 on Monday
+    ([{'op': 'reassign', 'shift_id': 'first', 'username': 'emp1'}], {'max_shifts_per_day': 2},
+     'emp1 would be double-booked on 2030-01-07.'),
+    ([{'op': 'update', 'shift_id': 'first', 'start_time': '18:00', 'end_time': '20:00'},
+      {'op': 'reassign', 'shift_id': 'first', 'username': 'emp1'}], {},
+     'emp1 would work 2 shifts on 2030-01-07 (at most 1).'),
+    # Monday ends at 17:00 and Tuesday starts at 09:00, 16 hours later
+    ([{'op': 'reassign', 'shift_id': 'first', 'username': 'emp1', 'date': '2030-01-06'},
+      {'op': 'update', 'shift_id': 'first', 'start_time': '20:00', 'end_time': '23:00'}], {'min_rest_hours': 11},
+     'emp1 would get less than 11 hours rest before 2030-01-07.'),
+    ([{'op': 'reassign', 'shift_id': 'first', 'username': 'emp1', 'date': '2030-01-09'}],
+     {'max_shifts_per_employee': 2},
+     'emp1 would work 3 shifts between 2030-01-07 and 2030-01-13 (at most 2).'),
+])
+def test_edits_that_break_a_limit_are_conflicts_and_roll_back(app, shifts, operations, limits, message):
+    before = saved(app)
+    for operation in operations:
+        operation['shift_id'] = shifts[0]
+    with app.app_context():
+        with pytest.raises(ScheduleEditError) as exc:
+            apply_schedule_edits(operations, **limits)
+    assert not isinstance(exc.value, InvalidScheduleEdit)
+    assert str(exc.value) == message
+    assert saved(app) == before
+
+
+def test_missing_shift_or_employee_is_a_conflict(app, shifts):
+    with app.app_context():
+        with pytest.raises(ScheduleEditError, match='Shift 999 not found'):
+            apply_schedule_edits([{'op': 'delete', 'shift_id': 999}])
+        with pytest.raises(ScheduleEditError, match='Employee admin not found'):
+            apply_schedule_edits([{'op': 'reassign', 'shift_id': shifts[0], 'username': 'admin'}])
+
+
+def test_valid_batch_is_applied_together(app, shifts):
+    with app.app_context():
+        changed, deleted = apply_schedule_edits([
+            {'op': 'reassign', 'shift_id': shifts[0], 'username': 'emp2'},
+            {'op': 'update', 'shift_id': shifts[0], 'start_time': '10:00', 'end_time': '14:00'},
+            {'op': 'delete', 'shift_id': shifts[2]},
+        ])
+    assert changed == [{'id': shifts[0], 'username': 'emp2', 'date': '2030-01-07',
+                        'start_time': '10:00', 'end_time': '14:00'}]
+    assert deleted == [shifts[2]]
+    assert [(shift_id, username) for shift_id, username, _, _, _ in saved(app)] == \
+        [(shifts[0], 'emp2'), (shifts[1], 'emp1')]
+
+
+def test_batch_endpoint_answers_400_for_malformed_and_409_for_conflicts(admin_client, shifts):
+    malformed = admin_client.post('/schedules/batch', json={'operations': [
+        {'op': 'reassign', 'shift_id': shifts[0], 'username': ['emp1']}]})
+    assert malformed.status_code == 400
+    assert malformed.get_json()['index'] == 0
+
+    conflict = admin_client.post('/schedules/batch', json={'operations': [
+        {'op': 'reassign', 'shift_id': shifts[0], 'username': 'emp1'}]})
+    assert conflict.status_code == 409
+
+    assert admin_client.post('/schedules/batch', json={'operations': [
+        {'op': 'reassign', 'shift_id': shifts[0], 'username': 'emp2'}]}).status_code == 200
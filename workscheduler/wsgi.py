@@ -0,0 +1,34 @@
+"""
+WSGI entry point for running the scheduler under a production server.
+
+Run from the workscheduler folder, for example with gunicorn (pip install gunicorn):
+    SECRET_KEY=... gunicorn --workers 1 --threads 8 --bind 0.0.0.0:8000 wsgi:app
+
+Each worker calls create_app(), which does not load OR-Tools; a worker pays
+for the solver import the first time it runs a generation. Things to size
+together:
+
+- SECRET_KEY must be the same for every worker, or logins made on one
+  worker are rejected by the others.
+- Background generation jobs live in the worker that started them, so the
+  admin page's progress polling (/schedule_jobs/...) has to reach the same
+  worker: keep --workers 1 (scale with --threads) or route by client with
+  sticky sessions at the proxy.
+- Live schedule updates (/schedules/stream) are published in-process and
+  every open page holds one thread for its stream, up to
+  LIVE_UPDATES_MAX_STREAMS (default 4). Keep it well below --threads so
+  the other requests still get a thread: raise both together, e.g.
+  --threads 32 with LIVE_UPDATES_MAX_STREAMS=16. With several workers a
+  page only hears about edits saved by its own worker.
+- Each worker has its own connection pool (DB_POOL_SIZE + DB_MAX_OVERFLOW,
+  see core/database.py); it should cover --threads.
+- The database is SQLite (DATABASE_URL must be an sqlite:/// URL) and every
+  worker writes the same file; WAL mode lets pages keep reading during a
+  write and SQLITE_BUSY_TIMEOUT_MS sets how long a writer waits for the lock.
+- SCHEDULE_PARTITION_PROCESSES (default 1) starts that many solver processes
+  per worker, shared by all of its generations; keep workers times that
+  number at or below the core count.
+"""
+from app import create_app
+
+app = create_app()